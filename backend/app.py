@@ -1,54 +1,126 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import (Flask, Blueprint, request, jsonify, send_from_directory, Response, stream_with_context,
+                   has_request_context, current_app)
 from flask_cors import CORS
-from flask_mail import Mail, Message
 import os
 from dotenv import load_dotenv
 import logging
-import requests
 import json
-import urllib3
 import random
 import string
 import threading
+import time
+import contextvars
+from functools import wraps
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hmac
+import hashlib
+import importlib.util
+import sys
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import get_input_stream
+from werkzeug.middleware.proxy_fix import ProxyFix
+import tempfile
+from contextlib import contextmanager
+import itinerary_store
+import itinerary_edits
+import search_index
+import blob_store
+import bulk_transfer
+import hot_keys
+import speculation
+import uploads
+import usage_ledger
+import profiler
+from profiler import phase
+from circuit_breaker import CircuitBreaker, UpstreamUnavailable
+from rate_limit import (rate_limited, client_key, client_ip_key, client_keys, too_many_requests,
+                        SlidingWindowLimiter, RATE_LIMIT_DB_FILE)
 
-# Disable SSL warnings (optional, for development only)
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+def lazy_import(name):
+    """
+    Import a module on first attribute access, keeping rarely needed heavy
+    dependencies off the cold-start path
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+# Only upstream calls need requests (and urllib3/certifi with it)
+requests = lazy_import('requests')
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
+# Routes live on a blueprint so the app itself is built by create_app()
+api = Blueprint('api', __name__)
+
+# Admin endpoints are disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
 
-# Flask-Mail configuration
-app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
-app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 465))
-app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'False') == 'True'
-app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', 'True') == 'True'
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
+def is_admin_request():
+    """Check the X-Admin-Token header against ADMIN_TOKEN"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
 
-mail = Mail(app)
+def admin_required(view):
+    """Reject requests without a valid admin token"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin_request():
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
 
-# Upload configuration
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
+# Flask-Mail is only needed to send login codes; set up on first use
+_mail = None
+_mail_lock = threading.Lock()
+
+def get_mail():
+    global _mail
+    with _mail_lock:
+        if _mail is None:
+            from flask_mail import Mail
+            _mail = Mail(current_app._get_current_object())
+    return _mail
+
+# Upload configuration (the folder is created on first upload)
+UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', os.path.join(os.path.dirname(__file__), 'static', 'uploads'))
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+AVATAR_MAX_BYTES = int(os.getenv('AVATAR_MAX_BYTES', 2 * 1024 * 1024))
+# Room for multipart headers and the email field on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+UPLOAD_TIMEOUT_SECONDS = int(os.getenv('UPLOAD_TIMEOUT_SECONDS', 30))
+# Request body cap for every endpoint except the streamed admin import
+MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+
+# Proxies in front of the app (Render adds one); their X-Forwarded-For entries
+# are trusted for the client IP, anything further left is client-supplied
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 1))
 
 # In-memory storage for OTP codes (in production, use Redis or database)
 otp_storage = {}
 
 # User database file
-USERS_DB_FILE = os.path.join(os.path.dirname(__file__), 'users_db.json')
+USERS_DB_FILE = os.getenv('USERS_DB_FILE', os.path.join(os.path.dirname(__file__), 'users_db.json'))
 
 def load_users_db():
     """Load users database from JSON file"""
     if not os.path.exists(USERS_DB_FILE):
         return {}
     try:
-        with open(USERS_DB_FILE, 'r') as f:
+        with phase('users_db.load'), open(USERS_DB_FILE, 'r') as f:
             return json.load(f)
     except Exception as e:
         print(f"Error loading users database: {e}")
@@ -56,47 +128,285 @@ def load_users_db():
 
 def save_users_db(users_db):
     """Save users database to JSON file"""
+    temp_path = None
     try:
-        with open(USERS_DB_FILE, 'w') as f:
-            json.dump(users_db, f, indent=2)
+        with phase('users_db.save'):
+            # Write a temp file and rename it so readers never see a partial file
+            fd, temp_path = tempfile.mkstemp(prefix='users_db-', suffix='.json',
+                                             dir=os.path.dirname(os.path.abspath(USERS_DB_FILE)))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(users_db, f, indent=2)
+            os.replace(temp_path, USERS_DB_FILE)
         return True
     except Exception as e:
         print(f"Error saving users database: {e}")
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
         return False
 
+_users_db_thread_lock = threading.Lock()
+_users_db_lock_depth = threading.local()
+
+@contextmanager
+def users_db_lock():
+    """
+    Hold exclusive access to users_db.json for a load -> modify -> save cycle,
+    across threads and gunicorn workers (flock on a sidecar lock file where
+    fcntl is available). Blob references must be added and released under
+    the same lock so refcounts match the saved records. Re-entrant.
+    """
+    depth = getattr(_users_db_lock_depth, 'value', 0)
+    if depth:
+        _users_db_lock_depth.value = depth + 1
+        try:
+            yield
+        finally:
+            _users_db_lock_depth.value = depth
+        return
+    with _users_db_thread_lock, phase('users_db.lock'):
+        lock_file = open(USERS_DB_FILE + '.lock', 'a') if fcntl else None
+        try:
+            if lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _users_db_lock_depth.value = 1
+            try:
+                yield
+            finally:
+                _users_db_lock_depth.value = 0
+        finally:
+            if lock_file:
+                lock_file.close()
+
+def store_itinerary_content(itinerary):
+    """Move an itinerary's content into the blob store, leaving a contentRef"""
+    itinerary['contentRef'] = blob_store.put(itinerary.pop('content', '') or '')
+    return itinerary
+
+def hydrate_itineraries(itineraries):
+    """Copies of stored itineraries with their content read back from the blob store"""
+    texts = blob_store.get_many(it.get('contentRef') for it in itineraries)
+    hydrated = []
+    for itinerary in itineraries:
+        itinerary = dict(itinerary)
+        content_ref = itinerary.pop('contentRef', None)
+        if content_ref is not None:
+            itinerary['content'] = texts.get(content_ref, '')
+        hydrated.append(itinerary)
+    return hydrated
+
+def load_users_db_with_content():
+    """Load the users database with itinerary content inlined"""
+    users_db = load_users_db()
+    for user in users_db.values():
+        if user.get('itineraries'):
+            user['itineraries'] = hydrate_itineraries(user['itineraries'])
+    return users_db
+
+search_index.init(load_users_db_with_content)
+
+def update_search_index(action, *args):
+    """Apply a search index update; a failure must not fail the request"""
+    try:
+        action(*args)
+    except Exception as e:
+        print(f"Error updating search index: {e}")
+
+import_lock = threading.Lock()
+
+def run_import(lines, job_id, replace=False):
+    """
+    Stage NDJSON lines under job_id and merge them into the users database.
+    The staging file is kept if anything fails, so re-running the job resumes.
+    """
+    with import_lock:
+        job = bulk_transfer.ImportJob(job_id)
+        try:
+            staged, invalid = job.stage(lines)
+            # Staging streams the body without the lock; only the merge blocks saves
+            with users_db_lock():
+                result = job.merge(
+                    USERS_DB_FILE, blob_store.content_hash, blob_store.put_many, blob_store.release,
+                    on_itinerary=lambda email, it: update_search_index(search_index.index_itinerary, email, it),
+                    on_drop=lambda email, ids: update_search_index(search_index.remove_itineraries, email, ids),
+                    replace=replace
+                )
+        except Exception:
+            job.close()
+            raise
+        job.close(remove=True)
+    result.update({'staged': staged, 'invalid': invalid})
+    return result
+
+def hydrate_profile(user):
+    """Copy of a stored user with itinerary content read back from the blob store"""
+    if not user.get('itineraries'):
+        return user
+    return dict(user, itineraries=hydrate_itineraries(user['itineraries']))
+
 def get_user_profile(email):
     """Get user profile from database"""
     users_db = load_users_db()
-    return users_db.get(email, {'email': email, 'name': '', 'avatar': ''})
+    return hydrate_profile(users_db.get(email, {'email': email, 'name': '', 'avatar': ''}))
 
 def update_user_profile(email, updates):
     """Update user profile in database"""
-    users_db = load_users_db()
-    if email not in users_db:
-        users_db[email] = {'email': email, 'name': '', 'avatar': ''}
-    users_db[email].update(updates)
-    if save_users_db(users_db):
-        return users_db[email]
+    with users_db_lock():
+        users_db = load_users_db()
+        if email not in users_db:
+            users_db[email] = {'email': email, 'name': '', 'avatar': ''}
+        users_db[email].update(updates)
+        if save_users_db(users_db):
+            return hydrate_profile(users_db[email])
     return None
 
 # OpenRouter API configuration
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', "https://openrouter.ai/api/v1")
+OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', "openai/gpt-3.5-turbo")
 
 # Unsplash API configuration for location images
 UNSPLASH_ACCESS_KEY = os.getenv('UNSPLASH_ACCESS_KEY')
-UNSPLASH_API_URL = "https://api.unsplash.com/search/photos"
+UNSPLASH_API_URL = os.getenv('UNSPLASH_API_URL', "https://api.unsplash.com/search/photos")
 
-# Verify API key is set
-if not OPENROUTER_API_KEY:
-    print("WARNING: OPENROUTER_API_KEY not set. Please add it to .env file")
+# Circuit breakers: fail fast while an upstream is erroring or too slow
+BREAKER_FAILURE_RATE = float(os.getenv('BREAKER_FAILURE_RATE', 0.5))
+BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', 30))
+openrouter_breaker = CircuitBreaker(
+    'openrouter',
+    failure_rate=BREAKER_FAILURE_RATE,
+    slow_call_seconds=float(os.getenv('OPENROUTER_SLOW_CALL_SECONDS', 25)),
+    open_seconds=BREAKER_OPEN_SECONDS
+)
+unsplash_breaker = CircuitBreaker(
+    'unsplash',
+    failure_rate=BREAKER_FAILURE_RATE,
+    slow_call_seconds=float(os.getenv('UNSPLASH_SLOW_CALL_SECONDS', 5)),
+    open_seconds=BREAKER_OPEN_SECONDS
+)
 
-if not UNSPLASH_ACCESS_KEY:
-    print("WARNING: UNSPLASH_ACCESS_KEY not set. Image fetching will use fallback images.")
+_ssl_warnings_disabled = False
 
-def call_openrouter(prompt: str, max_tokens: int = 2000) -> str:
+def _checked_request(method, url, **kwargs):
+    """Issue an HTTP request and raise on error status codes"""
+    global _ssl_warnings_disabled
+    if not _ssl_warnings_disabled:
+        # Disable SSL warnings (optional, for development only)
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        _ssl_warnings_disabled = True
+    response = method(url, **kwargs)
+    response.raise_for_status()
+    return response
+
+# Token budget sizing for OpenRouter completions
+ITINERARY_BASE_TOKENS = 400
+ITINERARY_TOKENS_PER_DAY = 250
+ITINERARY_TOKENS_PER_INTEREST = 40
+ITINERARY_MAX_TOKENS = 4000
+ANSWER_BASE_TOKENS = 300
+ANSWER_MAX_TOKENS = 1200
+MIN_COMPLETION_TOKENS = 256
+# Largest max_tokens sent in one call. Bigger budgets are split across
+# continuations so a single call stays inside the request timeout and the
+# breaker's slow-call threshold.
+OPENROUTER_CALL_MAX_TOKENS = int(os.getenv('OPENROUTER_CALL_MAX_TOKENS', 2000))
+OPENROUTER_TIMEOUT_SECONDS = float(os.getenv('OPENROUTER_TIMEOUT_SECONDS', 30))
+
+# Continuation settings for responses cut off by max_tokens
+MAX_CONTINUATIONS = int(os.getenv('OPENROUTER_MAX_CONTINUATIONS', 2))
+CONTINUATION_PROMPT = "Continue exactly where you left off. Do not repeat anything you have already written."
+
+# Counters showing how often a continuation rescued a truncated response
+generation_stats = {
+    'requests': 0,
+    'truncated': 0,
+    'continuations': 0,
+    'retries_saved': 0,
+    'still_truncated': 0
+}
+generation_stats_lock = threading.Lock()
+
+def _record_generation_stat(key, amount=1):
+    with generation_stats_lock:
+        generation_stats[key] += amount
+
+def get_generation_stats():
+    """Return a snapshot of the continuation counters"""
+    with generation_stats_lock:
+        return dict(generation_stats)
+
+def estimate_itinerary_tokens(days, interests=None, additional_notes='') -> int:
     """
-    Call OpenRouter API with the given prompt
+    Size max_tokens for an itinerary from the trip length, interests and notes
+    """
+    try:
+        days = max(1, int(days))
+    except (TypeError, ValueError):
+        days = 3
+    budget = ITINERARY_BASE_TOKENS + days * ITINERARY_TOKENS_PER_DAY
+    budget += len(interests or []) * ITINERARY_TOKENS_PER_INTEREST
+    # Long notes usually ask for extra detail; roughly 4 characters per token
+    budget += min(len(additional_notes or ''), 2000) // 4
+    return max(MIN_COMPLETION_TOKENS, min(budget, ITINERARY_MAX_TOKENS))
+
+def estimate_answer_tokens(question: str) -> int:
+    """
+    Size max_tokens for a Q&A answer from the question length
+    """
+    budget = ANSWER_BASE_TOKENS + len(question or '') // 2
+    return max(MIN_COMPLETION_TOKENS, min(budget, ANSWER_MAX_TOKENS))
+
+def estimate_section_tokens(section_text: str, extra_sections: int = 0) -> int:
+    """
+    Size max_tokens for regenerating one section (or adding days) of an itinerary
+    """
+    budget = len(section_text or '') // 4 * (1 + extra_sections) * 3 // 2 + 100
+    return max(MIN_COMPLETION_TOKENS, min(budget, ITINERARY_MAX_TOKENS))
+
+# Token usage per user, endpoint and model; 0 disables the daily quota
+USAGE_DB_FILE = os.getenv('USAGE_DB_FILE', os.path.join(os.path.dirname(__file__), 'usage.db'))
+USER_DAILY_TOKEN_QUOTA = int(os.getenv('USER_DAILY_TOKEN_QUOTA', 0))
+ledger = usage_ledger.UsageLedger(USAGE_DB_FILE, flush_interval=float(os.getenv('USAGE_FLUSH_SECONDS', 5)))
+
+# (user, endpoint, client IP key) for OpenRouter calls made outside a request, e.g. on worker threads
+usage_owner = contextvars.ContextVar('usage_owner', default=None)
+
+def current_usage_owner():
+    owner = usage_owner.get()
+    if owner:
+        return owner
+    if has_request_context():
+        return client_key(), (request.endpoint or request.path).rsplit('.', 1)[-1], client_ip_key()
+    return 'system', 'background', None
+
+def with_usage_owner(owner, fn, *args, **kwargs):
+    """Run fn with OpenRouter usage attributed to owner"""
+    token = usage_owner.set(owner)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        usage_owner.reset(token)
+
+def quota_exceeded(keys):
+    """True if any of the client's keys (see client_keys) used up today's quota"""
+    return USER_DAILY_TOKEN_QUOTA > 0 and any(ledger.tokens_today(key) >= USER_DAILY_TOKEN_QUOTA for key in keys)
+
+def enforce_token_quota(view):
+    """Reject requests from clients that used up today's token quota"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if quota_exceeded(client_keys()):
+            return too_many_requests(
+                usage_ledger.seconds_until_midnight(),
+                f"Daily limit of {USER_DAILY_TOKEN_QUOTA} tokens reached"
+            )
+        return view(*args, **kwargs)
+    return wrapper
+
+def _post_openrouter(messages: list, max_tokens: int) -> dict:
+    """
+    Send one chat completion request and return the first choice's
+    content, finish_reason and the usage block
     """
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
@@ -106,103 +416,184 @@ def call_openrouter(prompt: str, max_tokens: int = 2000) -> str:
     }
     
     data = {
-        "model": "openai/gpt-3.5-turbo",  # You can change this to other models
-        "messages": [
-            {
-                "role": "system",
-                "content": "You are a helpful travel assistant with expertise in creating detailed travel itineraries."
-            },
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
+        "model": OPENROUTER_MODEL,
+        "messages": messages,
         "max_tokens": max_tokens,
         "temperature": 0.7
     }
     
     try:
-        response = requests.post(
-            f"{OPENROUTER_BASE_URL}/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=30,
-            verify=False  # Disable SSL verification (for troubleshooting)
-        )
-        response.raise_for_status()
+        started = time.perf_counter()
+        with phase('openrouter'):
+            response = openrouter_breaker.call(
+                _checked_request,
+                requests.post,
+                f"{OPENROUTER_BASE_URL}/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=OPENROUTER_TIMEOUT_SECONDS,
+                verify=False  # Disable SSL verification (for troubleshooting)
+            )
         
         result = response.json()
-        return result['choices'][0]['message']['content']
+        choice = result['choices'][0]
+        usage = result.get('usage') or {}
+        user, endpoint, ip = current_usage_owner()
+        ledger.record(
+            user, endpoint, result.get('model') or OPENROUTER_MODEL,
+            int(usage.get('prompt_tokens') or 0), int(usage.get('completion_tokens') or 0),
+            (time.perf_counter() - started) * 1000, ip=ip
+        )
+        return {
+            'content': choice['message']['content'] or '',
+            'finish_reason': choice.get('finish_reason'),
+            'usage': usage
+        }
     except requests.exceptions.SSLError as e:
         print(f"SSL Error: {str(e)}")
         raise Exception(f"SSL Connection Error: {str(e)}. Try updating certifi: pip install --upgrade certifi")
     except requests.exceptions.RequestException as e:
         raise Exception(f"OpenRouter API error: {str(e)}")
 
+def call_openrouter(prompt: str, max_tokens: int = 2000) -> str:
+    """
+    Call OpenRouter API with the given prompt.
+    If the reply is cut off (finish_reason == "length"), ask the model to
+    continue and append to the partial output instead of regenerating.
+    Each call asks for at most OPENROUTER_CALL_MAX_TOKENS; larger budgets
+    are finished by the continuations.
+    """
+    messages = [
+        {
+            "role": "system",
+            "content": "You are a helpful travel assistant with expertise in creating detailed travel itineraries."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+    
+    _record_generation_stat('requests')
+    result = _post_openrouter(messages, min(max_tokens, OPENROUTER_CALL_MAX_TOKENS))
+    text = result['content']
+    if result['finish_reason'] != 'length':
+        return text
+    
+    _record_generation_stat('truncated')
+    # Continuations only need to finish the tail, so give them half the budget
+    continuation_tokens = min(max(MIN_COMPLETION_TOKENS, max_tokens // 2), OPENROUTER_CALL_MAX_TOKENS)
+    for _ in range(MAX_CONTINUATIONS):
+        messages = messages[:2] + [
+            {"role": "assistant", "content": text},
+            {"role": "user", "content": CONTINUATION_PROMPT}
+        ]
+        _record_generation_stat('continuations')
+        result = _post_openrouter(messages, continuation_tokens)
+        text += result['content']
+        if result['finish_reason'] != 'length':
+            _record_generation_stat('retries_saved')
+            return text
+    
+    print(f"⚠️ Response still truncated after {MAX_CONTINUATIONS} continuations")
+    _record_generation_stat('still_truncated')
+    return text
+
+# Fallback images for common destinations
+FALLBACK_IMAGES = {
+    'default': 'https://images.unsplash.com/photo-1488646953014-85cb44e25828?w=800&q=80',
+    'paris': 'https://images.unsplash.com/photo-1502602898657-3e91760cbb34?w=800&q=80',
+    'tokyo': 'https://images.unsplash.com/photo-1540959733332-eab4deabeeaf?w=800&q=80',
+    'new york': 'https://images.unsplash.com/photo-1496442226666-8d4a0e62e6e9?w=800&q=80',
+    'london': 'https://images.unsplash.com/photo-1513635269975-59663e0ac1ad?w=800&q=80',
+    'dubai': 'https://images.unsplash.com/photo-1512453979798-5ea266f8880c?w=800&q=80',
+    'bali': 'https://images.unsplash.com/photo-1537996194471-e657df975ab4?w=800&q=80',
+    'rome': 'https://images.unsplash.com/photo-1552832230-c0197dd311b5?w=800&q=80',
+    'barcelona': 'https://images.unsplash.com/photo-1583422409516-2895a77efded?w=800&q=80',
+    'sydney': 'https://images.unsplash.com/photo-1506973035872-a4ec16b8e8d9?w=800&q=80',
+    'lagos nigeria': 'https://images.unsplash.com/photo-1618828665011-0abd973f7bb8?w=800&q=80',
+    'lagos': 'https://images.unsplash.com/photo-1618828665011-0abd973f7bb8?w=800&q=80',  # Default to Nigeria
+}
+
+# Map of ambiguous city names to their most common context
+# This helps resolve cities that exist in multiple countries
+CITY_CONTEXT_MAP = {
+    'lagos': 'Lagos Nigeria Africa city skyline',
+    'paris': 'Paris France Eiffel Tower',
+    'london': 'London England UK Big Ben',
+    'barcelona': 'Barcelona Spain Sagrada Familia',
+    'rome': 'Rome Italy Colosseum',
+    'sydney': 'Sydney Australia Opera House',
+    'melbourne': 'Melbourne Australia city',
+    'cairo': 'Cairo Egypt pyramids',
+    'athens': 'Athens Greece Acropolis',
+    'lima': 'Lima Peru South America',
+    'santiago': 'Santiago Chile South America',
+    'moscow': 'Moscow Russia Kremlin',
+    'berlin': 'Berlin Germany Brandenburg Gate',
+    'amsterdam': 'Amsterdam Netherlands canals',
+    'vienna': 'Vienna Austria palace',
+    'prague': 'Prague Czech Republic old town',
+    'budapest': 'Budapest Hungary parliament',
+    'istanbul': 'Istanbul Turkey mosque',
+    'mumbai': 'Mumbai India Gateway',
+    'delhi': 'Delhi India Lotus Temple',
+    'bangalore': 'Bangalore India tech city',
+    'shanghai': 'Shanghai China skyline',
+    'beijing': 'Beijing China Forbidden City',
+    'hong kong': 'Hong Kong China skyline harbor',
+    'singapore': 'Singapore Marina Bay',
+    'bangkok': 'Bangkok Thailand temple',
+    'kuala lumpur': 'Kuala Lumpur Malaysia Petronas',
+    'jakarta': 'Jakarta Indonesia city',
+    'manila': 'Manila Philippines city',
+    'cape town': 'Cape Town South Africa Table Mountain',
+    'johannesburg': 'Johannesburg South Africa city',
+    'nairobi': 'Nairobi Kenya Africa city',
+    'accra': 'Accra Ghana Africa city',
+    'abuja': 'Abuja Nigeria capital city',
+}
+
+# Unsplash results by normalized location; fallback images are never cached
+IMAGE_CACHE_SIZE = int(os.getenv('IMAGE_CACHE_SIZE', 1024))
+IMAGE_CACHE_TTL_SECONDS = int(os.getenv('IMAGE_CACHE_TTL_SECONDS', 6 * 3600))
+image_cache = OrderedDict()
+image_cache_lock = threading.Lock()
+
+def normalize_location(location: str) -> str:
+    return ' '.join(location.lower().split())
+
 def fetch_location_image(location: str) -> str:
+    """
+    Image URL for a location, served from the in-process cache when an
+    Unsplash result for it is still fresh
+    """
+    key = normalize_location(location)
+    now = time.monotonic()
+    with image_cache_lock:
+        cached = image_cache.get(key)
+        if cached and cached[1] > now:
+            image_cache.move_to_end(key)
+            return cached[0]
+    
+    image_url = _lookup_location_image(location)
+    if image_url not in FALLBACK_IMAGES.values():
+        with image_cache_lock:
+            image_cache[key] = (image_url, now + IMAGE_CACHE_TTL_SECONDS)
+            image_cache.move_to_end(key)
+            while len(image_cache) > IMAGE_CACHE_SIZE:
+                image_cache.popitem(last=False)
+    return image_url
+
+def _lookup_location_image(location: str) -> str:
     """
     Fetch a relevant image for a location using Unsplash API (web scraping)
     Falls back to a placeholder if API key not set or request fails
     """
-    # Fallback images for common destinations
-    fallback_images = {
-        'default': 'https://images.unsplash.com/photo-1488646953014-85cb44e25828?w=800&q=80',
-        'paris': 'https://images.unsplash.com/photo-1502602898657-3e91760cbb34?w=800&q=80',
-        'tokyo': 'https://images.unsplash.com/photo-1540959733332-eab4deabeeaf?w=800&q=80',
-        'new york': 'https://images.unsplash.com/photo-1496442226666-8d4a0e62e6e9?w=800&q=80',
-        'london': 'https://images.unsplash.com/photo-1513635269975-59663e0ac1ad?w=800&q=80',
-        'dubai': 'https://images.unsplash.com/photo-1512453979798-5ea266f8880c?w=800&q=80',
-        'bali': 'https://images.unsplash.com/photo-1537996194471-e657df975ab4?w=800&q=80',
-        'rome': 'https://images.unsplash.com/photo-1552832230-c0197dd311b5?w=800&q=80',
-        'barcelona': 'https://images.unsplash.com/photo-1583422409516-2895a77efded?w=800&q=80',
-        'sydney': 'https://images.unsplash.com/photo-1506973035872-a4ec16b8e8d9?w=800&q=80',
-        'lagos nigeria': 'https://images.unsplash.com/photo-1618828665011-0abd973f7bb8?w=800&q=80',
-        'lagos': 'https://images.unsplash.com/photo-1618828665011-0abd973f7bb8?w=800&q=80',  # Default to Nigeria
-    }
-    
     location_lower = location.lower().strip()
     
-    # Map of ambiguous city names to their most common context
-    # This helps resolve cities that exist in multiple countries
-    city_context_map = {
-        'lagos': 'Lagos Nigeria Africa city skyline',
-        'paris': 'Paris France Eiffel Tower',
-        'london': 'London England UK Big Ben',
-        'barcelona': 'Barcelona Spain Sagrada Familia',
-        'rome': 'Rome Italy Colosseum',
-        'sydney': 'Sydney Australia Opera House',
-        'melbourne': 'Melbourne Australia city',
-        'cairo': 'Cairo Egypt pyramids',
-        'athens': 'Athens Greece Acropolis',
-        'lima': 'Lima Peru South America',
-        'santiago': 'Santiago Chile South America',
-        'moscow': 'Moscow Russia Kremlin',
-        'berlin': 'Berlin Germany Brandenburg Gate',
-        'amsterdam': 'Amsterdam Netherlands canals',
-        'vienna': 'Vienna Austria palace',
-        'prague': 'Prague Czech Republic old town',
-        'budapest': 'Budapest Hungary parliament',
-        'istanbul': 'Istanbul Turkey mosque',
-        'mumbai': 'Mumbai India Gateway',
-        'delhi': 'Delhi India Lotus Temple',
-        'bangalore': 'Bangalore India tech city',
-        'shanghai': 'Shanghai China skyline',
-        'beijing': 'Beijing China Forbidden City',
-        'hong kong': 'Hong Kong China skyline harbor',
-        'singapore': 'Singapore Marina Bay',
-        'bangkok': 'Bangkok Thailand temple',
-        'kuala lumpur': 'Kuala Lumpur Malaysia Petronas',
-        'jakarta': 'Jakarta Indonesia city',
-        'manila': 'Manila Philippines city',
-        'cape town': 'Cape Town South Africa Table Mountain',
-        'johannesburg': 'Johannesburg South Africa city',
-        'nairobi': 'Nairobi Kenya Africa city',
-        'accra': 'Accra Ghana Africa city',
-        'abuja': 'Abuja Nigeria capital city',
-    }
-    
     # Check fallback first for exact matches with context
-    for city, url in fallback_images.items():
+    for city, url in FALLBACK_IMAGES.items():
         if city in location_lower or location_lower in city:
             # If no API key, use fallback directly
             if not UNSPLASH_ACCESS_KEY:
@@ -213,7 +604,7 @@ def fetch_location_image(location: str) -> str:
     search_query = location
     
     # Check if we have a specific context for this city
-    for city_key, context in city_context_map.items():
+    for city_key, context in CITY_CONTEXT_MAP.items():
         if city_key in location_lower:
             search_query = context
             print(f"🔍 Using specific search context for {location}: {search_query}")
@@ -240,14 +631,16 @@ def fetch_location_image(location: str) -> str:
                 "content_filter": "high"  # Filter for high-quality content
             }
             
-            response = requests.get(
-                UNSPLASH_API_URL,
-                headers=headers,
-                params=params,
-                timeout=10,
-                verify=False
-            )
-            response.raise_for_status()
+            with phase('unsplash'):
+                response = unsplash_breaker.call(
+                    _checked_request,
+                    requests.get,
+                    UNSPLASH_API_URL,
+                    headers=headers,
+                    params=params,
+                    timeout=10,
+                    verify=False
+                )
             
             data = response.json()
             if data.get('results') and len(data['results']) > 0:
@@ -267,17 +660,75 @@ def fetch_location_image(location: str) -> str:
                 image_url = best_image['urls'].get('regular', best_image['urls'].get('small'))
                 print(f"✅ Fetched image for {location} (query: {search_query}): {image_url[:60]}...")
                 return image_url
+        except UpstreamUnavailable:
+            # Unsplash is failing; go straight to the static fallback images
+            pass
         except Exception as e:
             print(f"⚠️ Failed to fetch image from Unsplash: {str(e)}")
     
     # Return fallback image
-    for city, url in fallback_images.items():
+    for city, url in FALLBACK_IMAGES.items():
         if city in location_lower or location_lower in city:
             return url
     
-    return fallback_images['default']
+    return FALLBACK_IMAGES['default']
+
+# Heavy-hitter analytics: which destinations, trip shapes and questions dominate
+HOT_KEY_THRESHOLD = float(os.getenv('HOT_KEY_THRESHOLD', 20))
+HOT_KEY_PREWARM = os.getenv('HOT_KEY_PREWARM', 'True') == 'True'
+prewarm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prewarm')
+prewarm_stats = {'images': 0, 'itineraries': 0, 'skipped': 0, 'failed': 0}
+
+def normalize_question(question: str) -> str:
+    """Collapse case, whitespace and trailing punctuation so repeats count together"""
+    return ' '.join(question.lower().split()).rstrip('?!. ')[:200]
+
+def prewarm_plan(plan_key):
+    """Generate a hot (destination, days, budget, interests) plan into the pre-generated store"""
+    destination, days, budget, interests = plan_key.rsplit(':', 3)
+    interests = interests.split('|') if interests else []
+    if itinerary_store.lookup(destination, days, budget, interests):
+        prewarm_stats['skipped'] += 1
+        return
+    prompt = build_itinerary_prompt(destination, int(days), budget, interests)
+    itinerary_text = call_openrouter(prompt, max_tokens=estimate_itinerary_tokens(int(days), interests))
+    conn = itinerary_store.open_writer()
+    try:
+        itinerary_store.put(conn, destination, int(days), budget, interests,
+                            itinerary_text, fetch_location_image(destination))
+    finally:
+        conn.close()
+    prewarm_stats['itineraries'] += 1
+
+def _run_prewarm(dimension, key):
+    try:
+        if dimension == 'destinations':
+            fetch_location_image(key)
+            prewarm_stats['images'] += 1
+        elif dimension == 'plans':
+            with_usage_owner(('system', 'prewarm', None), prewarm_plan, key)
+        print(f"🔥 Prewarmed hot {dimension[:-1]}: {key}")
+    except Exception as e:
+        prewarm_stats['failed'] += 1
+        print(f"⚠️ Failed to prewarm {key}: {e}")
+
+def on_hot_key(dimension, key):
+    if HOT_KEY_PREWARM and dimension in ('destinations', 'plans'):
+        prewarm_executor.submit(_run_prewarm, dimension, key)
 
-@app.route('/api/get-location-image', methods=['POST'])
+hot_key_tracker = hot_keys.HotKeyTracker(
+    ('destinations', 'trips', 'plans', 'questions'),
+    capacity=int(os.getenv('HOT_KEY_CAPACITY', 200)),
+    fast_half_life=float(os.getenv('HOT_KEY_FAST_HALF_LIFE_SECONDS', 900)),
+    slow_half_life=float(os.getenv('HOT_KEY_SLOW_HALF_LIFE_SECONDS', 86400)),
+    hot_threshold=HOT_KEY_THRESHOLD,
+    on_hot=on_hot_key
+)
+
+def record_destination(destination):
+    hot_key_tracker.record('destinations', normalize_location(destination))
+
+@api.route('/api/get-location-image', methods=['POST'])
 def get_location_image():
     """
     Fetch image for a specific location
@@ -289,6 +740,7 @@ def get_location_image():
         if not location:
             return jsonify({'error': 'Location is required'}), 400
         
+        record_destination(location)
         image_url = fetch_location_image(location)
         
         return jsonify({
@@ -304,34 +756,235 @@ def get_location_image():
             'details': str(e)
         }), 500
 
-@app.route('/health', methods=['GET'])
+# HTTP caching for GET /api/location-image; fallbacks get a short max-age so
+# a real photo replaces them once Unsplash answers again
+IMAGE_HTTP_MAX_AGE = int(os.getenv('IMAGE_HTTP_MAX_AGE', 86400))
+IMAGE_HTTP_FALLBACK_MAX_AGE = int(os.getenv('IMAGE_HTTP_FALLBACK_MAX_AGE', 300))
+IMAGE_HTTP_STALE_WHILE_REVALIDATE = int(os.getenv('IMAGE_HTTP_STALE_WHILE_REVALIDATE', 7 * 86400))
+MAX_IMAGE_BATCH = 20
+
+@api.route('/api/location-image', methods=['GET'])
+def location_image():
+    """
+    Cacheable image lookup: ?q=paris, or repeat q for a batch
+    (?q=paris&q=rome). Returns {images: {normalized location: url}}, plus
+    imageUrl for a single location.
+    """
+    locations = list(dict.fromkeys(
+        normalize_location(q) for q in request.args.getlist('q') if q.strip()
+    ))
+    if not locations:
+        return jsonify({'error': 'At least one q parameter is required'}), 400
+    if len(locations) > MAX_IMAGE_BATCH:
+        return jsonify({'error': f'At most {MAX_IMAGE_BATCH} locations per request'}), 400
+    
+    try:
+        for location in locations:
+            record_destination(location)
+        if len(locations) == 1:
+            urls = [fetch_location_image(locations[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(8, len(locations))) as pool:
+                urls = list(pool.map(fetch_location_image, locations))
+    except Exception as e:
+        print(f"Error fetching location images: {str(e)}")
+        return jsonify({
+            'error': 'Failed to fetch image',
+            'details': str(e)
+        }), 500
+    
+    images = dict(zip(locations, urls))
+    payload = {'success': True, 'images': images}
+    if len(locations) == 1:
+        payload.update(imageUrl=urls[0], location=locations[0])
+    response = jsonify(payload)
+    
+    has_fallback = UNSPLASH_ACCESS_KEY and any(url in FALLBACK_IMAGES.values() for url in urls)
+    max_age = IMAGE_HTTP_FALLBACK_MAX_AGE if has_fallback else IMAGE_HTTP_MAX_AGE
+    response.headers['Cache-Control'] = (
+        f"public, max-age={max_age}, stale-while-revalidate={IMAGE_HTTP_STALE_WHILE_REVALIDATE}"
+    )
+    response.set_etag(hashlib.sha256(response.get_data()).hexdigest()[:32])
+    return response.make_conditional(request)
+
+@api.app_errorhandler(413)
+def request_too_large(error):
+    return jsonify({
+        'error': 'Request too large',
+        'details': f"Maximum request size is {MAX_CONTENT_LENGTH} bytes"
+    }), 413
+
+@api.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'message': 'Sentient Agent Framework API is running'
+        'message': 'Sentient Agent Framework API is running',
+        'generation': get_generation_stats(),
+        'circuits': {
+            'openrouter': openrouter_breaker.snapshot(),
+            'unsplash': unsplash_breaker.snapshot()
+        },
+        'prefetch': speculative_cache.snapshot()
     })
 
-@app.route('/api/generate-itinerary', methods=['POST'])
-def generate_itinerary():
+def upstream_unavailable_response(error, message):
+    """Fast 503 returned while an upstream's circuit is open"""
+    return jsonify({
+        'error': message,
+        'details': str(error)
+    }), 503, {'Retry-After': str(error.retry_after)}
+
+@api.route('/api/admin/profiler', methods=['GET', 'POST'])
+@admin_required
+def admin_profiler():
     """
-    Generate a travel itinerary using OpenRouter API
+    Show or change profiler settings and list the slowest recent requests
     """
+    if request.method == 'POST':
+        data = request.json or {}
+        if 'enabled' in data:
+            profiler.settings['enabled'] = bool(data['enabled'])
+        if 'sampleRate' in data:
+            try:
+                sample_rate = float(data['sampleRate'])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'sampleRate must be a number between 0 and 1'}), 400
+            profiler.settings['sample_rate'] = min(1.0, max(0.0, sample_rate))
+        if data.get('clear'):
+            profiler.slow_requests.clear()
+    
+    slow_requests = []
+    for record in profiler.slow_requests.records():
+        summary = {key: value for key, value in record.items() if key != 'stacks'}
+        summary['sampled'] = bool(record['stacks'])
+        slow_requests.append(summary)
+    
+    return jsonify({
+        'success': True,
+        'enabled': profiler.settings['enabled'],
+        'sampleRate': profiler.settings['sample_rate'],
+        'slowRequests': slow_requests
+    })
+
+@api.route('/api/admin/profiler/stacks', methods=['GET'])
+@admin_required
+def admin_profiler_stacks():
+    """
+    Dump sampled stacks of the slow requests (or ?id=N) in collapsed format
+    for flamegraph.pl / speedscope
+    """
+    record_id = request.args.get('id', type=int)
+    if record_id is not None:
+        record = profiler.slow_requests.get(record_id)
+        if record is None:
+            return jsonify({'error': 'Request not found'}), 404
+        records = [record]
+    else:
+        records = profiler.slow_requests.records()
+    
+    return profiler.collapsed_stacks(records), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+@api.route('/api/admin/hot-keys', methods=['GET', 'POST'])
+@admin_required
+def admin_hot_keys():
+    """
+    Approximate top destinations, trip shapes (days:budget), plans and
+    questions over a recent and a long-term decayed window (?limit=N).
+    POST {"clear": true} resets the counters.
+    """
+    if request.method == 'POST' and (request.json or {}).get('clear'):
+        hot_key_tracker.clear()
+    
+    limit = min(max(request.args.get('limit', 20, type=int), 1), hot_key_tracker.fast['destinations'].capacity)
+    return jsonify({
+        'success': True,
+        'halfLifeSeconds': {
+            'recent': hot_key_tracker.fast_half_life,
+            'trend': hot_key_tracker.slow_half_life
+        },
+        'hotThreshold': HOT_KEY_THRESHOLD,
+        'prewarm': dict(prewarm_stats, enabled=HOT_KEY_PREWARM),
+        'imageCacheSize': len(image_cache),
+        'hotKeys': hot_key_tracker.snapshot(limit)
+    })
+
+@api.route('/api/admin/usage', methods=['GET'])
+@admin_required
+def admin_usage():
+    """
+    Token usage rollups. ?groupBy=user,endpoint,model,day (any subset),
+    ?since=&until= (YYYY-MM-DD, until exclusive), ?user=, ?limit=
+    """
+    group_by = [g for g in request.args.get('groupBy', 'user').split(',') if g]
+    invalid = [g for g in group_by if g not in usage_ledger.GROUP_COLUMNS]
+    if invalid:
+        return jsonify({'error': f"Unknown groupBy field(s): {', '.join(invalid)}"}), 400
+    
+    rows = ledger.rollup(
+        group_by=group_by,
+        since=request.args.get('since'),
+        until=request.args.get('until'),
+        user=request.args.get('user'),
+        limit=min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    )
+    return jsonify({'success': True, 'groupBy': group_by, 'usage': rows})
+
+@api.route('/api/admin/export', methods=['GET'])
+@admin_required
+def admin_export():
+    """
+    Stream users and itineraries as NDJSON. Filters: ?since=&until= (ISO
+    createdAt), ?email= (repeatable); ?cursor=N resumes after the Nth user.
+    """
+    records = bulk_transfer.export_records(
+        USERS_DB_FILE, hydrate_itineraries,
+        since=request.args.get('since'),
+        until=request.args.get('until'),
+        emails=request.args.getlist('email'),
+        cursor=request.args.get('cursor', 0, type=int)
+    )
+    return Response(stream_with_context(bulk_transfer.to_ndjson(records)), mimetype='application/x-ndjson')
+
+@api.route('/api/admin/import', methods=['POST'])
+@admin_required
+def admin_import():
+    """
+    Import an NDJSON body produced by /api/admin/export. ?mode=replace drops
+    users missing from the import. Every import runs as a job; a failed one
+    is resumed by re-sending the same body with ?job= set to the job ID
+    from the error response.
+    """
+    mode = request.args.get('mode', 'merge')
+    if mode not in ('merge', 'replace'):
+        return jsonify({'error': 'mode must be merge or replace'}), 400
+    
+    job_id = request.args.get('job') or bulk_transfer.new_job_id()
     try:
-        data = request.json
-        
-        # Extract parameters
-        destination = data.get('destination', '')
-        days = data.get('days', 3)
-        budget = data.get('budget', 'moderate')
-        interests = data.get('interests', [])
-        additional_notes = data.get('additionalNotes', '')
-        
-        if not destination:
-            return jsonify({'error': 'Destination is required'}), 400
-        
-        # Build the prompt
-        prompt = f"""Create a detailed travel itinerary for a {days}-day trip to {destination}.
+        # Imports can exceed MAX_CONTENT_LENGTH; they are streamed and staged on disk
+        stream = get_input_stream(request.environ, max_content_length=None)
+        result = run_import(stream, job_id, replace=mode == 'replace')
+    except bulk_transfer.ImportMismatch as e:
+        return jsonify({
+            'error': 'Import does not match job',
+            'details': str(e),
+            'job': job_id
+        }), 409
+    except Exception as e:
+        print(f"Error importing users: {e}")
+        return jsonify({
+            'error': 'Import failed',
+            'details': str(e),
+            'job': job_id
+        }), 500
+    
+    return jsonify({'success': True, 'job': job_id, **result})
+
+def build_itinerary_prompt(destination, days, budget, interests, additional_notes='') -> str:
+    """
+    Build the OpenRouter prompt for a full itinerary
+    """
+    return f"""Create a detailed travel itinerary for a {days}-day trip to {destination}.
 
 Budget Level: {budget}
 Interests: {', '.join(interests) if interests else 'General sightseeing'}
@@ -349,8 +1002,168 @@ Please provide:
 
 Format the response in a clear, structured way with proper headings and bullet points."""
 
-        # Call OpenRouter
-        itinerary_text = call_openrouter(prompt, max_tokens=2000)
+# Per-client request budgets for the endpoints that call OpenRouter
+GENERATE_RATE_LIMIT = int(os.getenv('GENERATE_RATE_LIMIT', 10))
+ASK_RATE_LIMIT = int(os.getenv('ASK_RATE_LIMIT', 30))
+
+# Speculative generation started by /api/prefetch while the form is being filled in
+PREFETCH_TTL_SECONDS = int(os.getenv('PREFETCH_TTL_SECONDS', 300))
+# Longest a submit waits on a running speculation; never more than one upstream call's timeout
+PREFETCH_WAIT_SECONDS = min(float(os.getenv('PREFETCH_WAIT_SECONDS', OPENROUTER_TIMEOUT_SECONDS)),
+                            OPENROUTER_TIMEOUT_SECONDS)
+PREFETCH_GENERATIONS_PER_HOUR = int(os.getenv('PREFETCH_GENERATIONS_PER_HOUR', 5))
+speculative_cache = speculation.SpeculativeCache(
+    ttl=PREFETCH_TTL_SECONDS,
+    max_entries=int(os.getenv('PREFETCH_MAX_PENDING', 64)),
+    workers=int(os.getenv('PREFETCH_WORKERS', 2))
+)
+# Own file: the hourly window must not share counter cleanup with the per-minute limits
+prefetch_limiter = SlidingWindowLimiter(os.path.splitext(RATE_LIMIT_DB_FILE)[0] + '_prefetch.db', 3600)
+image_prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='prefetch-image')
+
+def positive_int(value):
+    """value as an int if it is a whole number >= 1, otherwise None"""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number >= 1 else None
+
+def likely_trip_shape():
+    """Currently most requested (days, budget), or the form defaults"""
+    for key, _, _ in hot_key_tracker.top('trips', 5):
+        days, _, budget = key.partition(':')
+        if positive_int(days) and budget:
+            return int(days), budget
+    return 3, 'moderate'
+
+def speculative_generation(destination, days, budget, interests):
+    prompt = build_itinerary_prompt(destination, days, budget, interests)
+    return call_openrouter(prompt, max_tokens=estimate_itinerary_tokens(days, interests))
+
+@api.route('/api/prefetch', methods=['POST'])
+def prefetch():
+    """
+    Start the image lookup and a speculative generation for the most likely
+    parameters once the destination field settles. Fields the user has not
+    picked yet default to the most popular trip shape.
+    """
+    try:
+        data = request.json or {}
+        destination = str(data.get('destination', '')).strip()
+        if len(destination) < 3:
+            return jsonify({'error': 'Destination is required'}), 400
+        
+        days = data.get('days')
+        budget = data.get('budget')
+        if days in (None, '') or not budget:
+            guessed_days, guessed_budget = likely_trip_shape()
+            days = guessed_days if days in (None, '') else days
+            budget = budget or guessed_budget
+        days = positive_int(days)
+        if days is None:
+            return jsonify({'error': 'Days must be a whole number of at least 1'}), 400
+        interests = data.get('interests') or []
+        if not isinstance(interests, list) or not all(isinstance(i, str) for i in interests):
+            return jsonify({'error': 'Interests must be a list of strings'}), 400
+        
+        image_prefetch_executor.submit(fetch_location_image, destination)
+        
+        key = itinerary_store.make_key(destination, days, budget, interests)
+        status = 'started'
+        if data.get('additionalNotes') or itinerary_store.lookup(destination, days, budget, interests):
+            # Notes are free text we cannot match on; stored plans are already instant
+            status = 'not_needed'
+        elif speculative_cache.has(key):
+            status = 'pending'
+        else:
+            client, keys = client_key(), client_keys()
+            try:
+                capped = quota_exceeded(keys) or any(
+                    prefetch_limiter.hit(f"prefetch:{key}", PREFETCH_GENERATIONS_PER_HOUR) for key in keys
+                )
+            except Exception as e:
+                print(f"Prefetch limiter error: {e}")
+                capped = 1
+            if capped:
+                speculative_cache.stats['capped'] += 1
+                status = 'capped'
+            elif not speculative_cache.start(key, with_usage_owner, (client, 'prefetch', keys[0]), speculative_generation,
+                                             destination, days, budget, interests):
+                status = 'busy'
+        
+        return jsonify({
+            'success': True,
+            'status': status,
+            'days': days,
+            'budget': budget
+        }), 202
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'error': 'Invalid prefetch parameters',
+            'details': str(e)
+        }), 400
+
+@api.route('/api/generate-itinerary', methods=['POST'])
+@enforce_token_quota
+@rate_limited('generate', GENERATE_RATE_LIMIT)
+def generate_itinerary():
+    """
+    Generate a travel itinerary using OpenRouter API. Send the user's email
+    so token usage is attributed to the user; limits apply to both the
+    email and the IP.
+    """
+    try:
+        data = request.json
+        
+        # Extract parameters
+        destination = data.get('destination', '')
+        days = data.get('days', 3)
+        budget = data.get('budget', 'moderate')
+        interests = data.get('interests', [])
+        additional_notes = data.get('additionalNotes', '')
+        
+        if not destination:
+            return jsonify({'error': 'Destination is required'}), 400
+        
+        record_destination(destination)
+        # Only well-formed shapes, since prefetch falls back to the top one
+        if positive_int(days):
+            hot_key_tracker.record('trips', f"{int(days)}:{str(budget).strip().lower()}")
+        if not additional_notes:
+            hot_key_tracker.record('plans', itinerary_store.make_key(destination, days, budget, interests))
+        
+        # Serve popular destinations from the pre-generated store
+        if not additional_notes:
+            pregenerated = itinerary_store.lookup(destination, days, budget, interests)
+            if pregenerated:
+                return jsonify({
+                    'success': True,
+                    'itinerary': pregenerated['itinerary'],
+                    'destination': destination,
+                    'days': days,
+                    'budget': budget,
+                    'imageUrl': pregenerated['imageUrl'],
+                    'pregenerated': True
+                })
+        
+        # Promote a matching speculative generation started by /api/prefetch
+        itinerary_text = None
+        if not additional_notes:
+            itinerary_text = speculative_cache.take(
+                itinerary_store.make_key(destination, days, budget, interests), PREFETCH_WAIT_SECONDS
+            )
+        
+        if itinerary_text is None:
+            with phase('prompt'):
+                prompt = build_itinerary_prompt(destination, days, budget, interests, additional_notes)
+
+            # Call OpenRouter
+            itinerary_text = call_openrouter(
+                prompt,
+                max_tokens=estimate_itinerary_tokens(days, interests, additional_notes)
+            )
         
         # Fetch location image
         image_url = fetch_location_image(destination)
@@ -364,6 +1177,21 @@ Format the response in a clear, structured way with proper headings and bullet p
             'imageUrl': image_url
         })
         
+    except UpstreamUnavailable as e:
+        # Degraded mode: closest pre-generated plan for the same trip length
+        fallback = itinerary_store.lookup_closest(destination, days, budget)
+        if fallback:
+            return jsonify({
+                'success': True,
+                'itinerary': fallback['itinerary'],
+                'destination': destination,
+                'days': days,
+                'budget': budget,
+                'imageUrl': fallback['imageUrl'],
+                'pregenerated': True,
+                'degraded': True
+            })
+        return upstream_unavailable_response(e, 'Itinerary service is temporarily unavailable')
     except Exception as e:
         print(f"Error generating itinerary: {str(e)}")
         return jsonify({
@@ -371,10 +1199,13 @@ Format the response in a clear, structured way with proper headings and bullet p
             'details': str(e)
         }), 500
 
-@app.route('/api/ask-question', methods=['POST'])
+@api.route('/api/ask-question', methods=['POST'])
+@enforce_token_quota
+@rate_limited('ask', ASK_RATE_LIMIT)
 def ask_question():
     """
-    Ask a specific question about the destination using OpenRouter API
+    Ask a specific question about the destination using OpenRouter API.
+    Like generation, usage is attributed to the email in the body if given.
     """
     try:
         data = request.json
@@ -384,6 +1215,10 @@ def ask_question():
         if not question:
             return jsonify({'error': 'Question is required'}), 400
         
+        hot_key_tracker.record('questions', normalize_question(question))
+        if destination:
+            record_destination(destination)
+        
         # Build the prompt
         prompt = f"""Answer this travel-related question about {destination if destination else 'travel'}:
 
@@ -392,13 +1227,15 @@ Question: {question}
 Provide a detailed, helpful answer based on current information."""
 
         # Call OpenRouter
-        answer_text = call_openrouter(prompt, max_tokens=1000)
+        answer_text = call_openrouter(prompt, max_tokens=estimate_answer_tokens(question))
         
         return jsonify({
             'success': True,
             'answer': answer_text
         })
         
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e, 'Question answering is temporarily unavailable')
     except Exception as e:
         print(f"Error answering question: {str(e)}")
         return jsonify({
@@ -406,7 +1243,7 @@ Provide a detailed, helpful answer based on current information."""
             'details': str(e)
         }), 500
 
-@app.route('/api/auth/send-code', methods=['POST'])
+@api.route('/api/auth/send-code', methods=['POST'])
 def send_code():
     """
     Generate and send OTP code to user's email
@@ -427,6 +1264,8 @@ def send_code():
         
         # Send email
         try:
+            from flask_mail import Message
+            get_mail()  # Message() reads the mail extension's default sender
             msg = Message(
                 subject='Your Travel Itinerary Login Code',
                 recipients=[email],
@@ -446,12 +1285,12 @@ Travel Itinerary Team'''
             def send_async_email(app, msg):
                 with app.app_context():
                     try:
-                        mail.send(msg)
+                        get_mail().send(msg)
                         print(f"✅ Email sent to {email} via Gmail")
                     except Exception as e:
                         print(f"Gmail email error: {str(e)}")
 
-            thread = threading.Thread(target=send_async_email, args=(app, msg))
+            thread = threading.Thread(target=send_async_email, args=(current_app._get_current_object(), msg))
             thread.start()
             
             return jsonify({
@@ -472,7 +1311,7 @@ Travel Itinerary Team'''
             'details': str(e)
         }), 500
 
-@app.route('/api/auth/verify-code', methods=['POST'])
+@api.route('/api/auth/verify-code', methods=['POST'])
 def verify_code():
     """
     Verify OTP code
@@ -515,43 +1354,49 @@ def verify_code():
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@app.route('/api/user/upload-avatar', methods=['POST'])
+@api.route('/api/user/upload-avatar', methods=['POST'])
 def upload_avatar():
     """
-    Upload user avatar image
+    Upload user avatar image. The body is streamed to a temp file in chunks,
+    so oversized or non-image uploads are rejected without buffering them.
     """
+    boundary = request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
+        return jsonify({'error': 'No file provided'}), 400
+    
+    max_mb = AVATAR_MAX_BYTES // (1024 * 1024)
+    if request.content_length and request.content_length > AVATAR_MAX_BYTES + MULTIPART_OVERHEAD_BYTES:
+        return jsonify({'error': f'File too large. Maximum size is {max_mb}MB'}), 413
+    
+    temp_path = None
     try:
-        if 'avatar' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-        
-        file = request.files['avatar']
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        try:
+            sock = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+            temp_path, original_name, image_type, fields = uploads.receive_image(
+                request.stream, boundary, 'avatar', UPLOAD_FOLDER, AVATAR_MAX_BYTES, UPLOAD_TIMEOUT_SECONDS, sock
+            )
+        except uploads.UploadError as e:
+            return jsonify({'error': e.message}), e.status
         
-        if file.filename == '':
+        if not original_name:
             return jsonify({'error': 'No file selected'}), 400
         
-        if not allowed_file(file.filename):
+        if not allowed_file(original_name):
             return jsonify({'error': 'Invalid file type. Only PNG, JPG, JPEG, and GIF allowed'}), 400
         
-        # Check file size (2MB limit)
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-        
-        if file_size > 2 * 1024 * 1024:
-            return jsonify({'error': 'File too large. Maximum size is 2MB'}), 400
-        
-        # Generate unique filename
-        filename = secure_filename(file.filename)
-        unique_filename = f"{random.randint(1000000, 9999999)}_{filename}"
-        filepath = os.path.join(UPLOAD_FOLDER, unique_filename)
-        
-        file.save(filepath)
+        # Generate unique filename; the extension follows the sniffed content,
+        # not the client's name, so PNG bytes are never served as .gif
+        stem = os.path.splitext(secure_filename(original_name))[0] or 'avatar'
+        unique_filename = f"{random.randint(1000000, 9999999)}_{stem}.{image_type}"
+        uploads.commit_upload(temp_path, os.path.join(UPLOAD_FOLDER, unique_filename))
+        temp_path = None
         
         # Return URL
         avatar_url = f"http://localhost:5000/static/uploads/{unique_filename}"
         
         # Get email from request (should be sent with the file)
-        email = request.form.get('email')
+        email = fields.get('email')
         if email:
             # Save avatar URL to user profile
             update_user_profile(email, {'avatar': avatar_url})
@@ -567,15 +1412,18 @@ def upload_avatar():
             'error': 'Failed to upload avatar',
             'details': str(e)
         }), 500
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
 
-@app.route('/static/uploads/<filename>', methods=['GET'])
+@api.route('/static/uploads/<filename>', methods=['GET'])
 def serve_upload(filename):
     """
     Serve uploaded files
     """
     return send_from_directory(UPLOAD_FOLDER, filename)
 
-@app.route('/api/user/update-profile', methods=['POST'])
+@api.route('/api/user/update-profile', methods=['POST'])
 def update_profile():
     """
     Update user profile information
@@ -615,7 +1463,7 @@ def update_profile():
             'details': str(e)
         }), 500
 
-@app.route('/api/user/save-itinerary', methods=['POST'])
+@api.route('/api/user/save-itinerary', methods=['POST'])
 def save_itinerary():
     """
     Save a generated itinerary to user's profile
@@ -639,22 +1487,31 @@ def save_itinerary():
             'status': data.get('status', 'planned')
         }
         
-        # Load current user data
-        users_db = load_users_db()
-        if email not in users_db:
-            users_db[email] = {'email': email, 'name': '', 'avatar': '', 'itineraries': []}
-        
-        # Initialize itineraries array if not exists
-        if 'itineraries' not in users_db[email]:
-            users_db[email]['itineraries'] = []
-        
-        # Add new itinerary (prepend to keep most recent first)
-        users_db[email]['itineraries'].insert(0, itinerary)
-        
-        # Keep only last 20 itineraries to prevent storage bloat
-        users_db[email]['itineraries'] = users_db[email]['itineraries'][:20]
+        with users_db_lock():
+            # Load current user data
+            users_db = load_users_db()
+            if email not in users_db:
+                users_db[email] = {'email': email, 'name': '', 'avatar': '', 'itineraries': []}
+            
+            # Initialize itineraries array if not exists
+            if 'itineraries' not in users_db[email]:
+                users_db[email]['itineraries'] = []
+            
+            # Add new itinerary (prepend to keep most recent first); the body
+            # goes to the blob store and the record keeps a reference
+            record = store_itinerary_content(dict(itinerary))
+            users_db[email]['itineraries'].insert(0, record)
+            
+            # Keep only last 20 itineraries to prevent storage bloat
+            dropped = users_db[email]['itineraries'][20:]
+            users_db[email]['itineraries'] = users_db[email]['itineraries'][:20]
+            
+            saved = save_users_db(users_db)
+            blob_store.release([it.get('contentRef') for it in dropped] if saved else [record['contentRef']])
         
-        if save_users_db(users_db):
+        if saved:
+            update_search_index(search_index.remove_itineraries, email, [it.get('id') for it in dropped])
+            update_search_index(search_index.index_itinerary, email, itinerary)
             return jsonify({
                 'success': True,
                 'message': 'Itinerary saved successfully',
@@ -673,7 +1530,143 @@ def save_itinerary():
             'details': str(e)
         }), 500
 
-@app.route('/api/user/itineraries', methods=['GET'])
+@api.route('/api/user/edit-itinerary', methods=['POST'])
+@enforce_token_quota
+@rate_limited('edit', GENERATE_RATE_LIMIT)
+def edit_itinerary():
+    """
+    Apply a targeted change to a saved itinerary, regenerating only the
+    affected sections. The change is one of:
+      {"type": "day", "day": 2, "instructions": "..."}
+      {"type": "budget", "budget": "luxury"}
+      {"type": "interests", "interests": ["Food & Dining"]}
+      {"type": "days", "days": 5}
+    """
+    try:
+        data = request.json
+        email = data.get('email', '').strip()
+        itinerary_id = data.get('itineraryId', '')
+        change = data.get('change') or {}
+        
+        if not email or not itinerary_id:
+            return jsonify({'error': 'Email and itinerary ID are required'}), 400
+        if change.get('type') not in itinerary_edits.EDIT_TYPES:
+            return jsonify({'error': f"Change type must be one of: {', '.join(itinerary_edits.EDIT_TYPES)}"}), 400
+        if change['type'] == 'interests':
+            interests = change.get('interests') or []
+            if not isinstance(interests, list) or not all(isinstance(i, str) for i in interests):
+                return jsonify({'error': 'Interests must be a list of strings'}), 400
+        
+        users_db = load_users_db()
+        itineraries = users_db.get(email, {}).get('itineraries', [])
+        record = next((it for it in itineraries if it.get('id') == itinerary_id), None)
+        if record is None:
+            return jsonify({'error': 'Itinerary not found'}), 404
+        itinerary = hydrate_itineraries([record])[0]
+        
+        original = itinerary.get('content', '')
+        sections = itinerary_edits.split_sections(original)
+        try:
+            affected = set(itinerary_edits.affected_sections(sections, change, itinerary))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        jobs = [
+            (section, itinerary_edits.build_section_prompt(section, change, itinerary),
+             estimate_section_tokens(section['text']))
+            for section in sections if section['key'] in affected
+        ]
+        
+        # Trip length changes: drop trailing days, or generate only the new ones
+        day_sections = [section for section in sections if section['day'] is not None]
+        new_days = None
+        if change['type'] == 'days':
+            try:
+                target_days = int(change.get('days'))
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Days must be a whole number'}), 400
+            if target_days < 1:
+                return jsonify({'error': 'Days must be at least 1'}), 400
+            if not day_sections:
+                return jsonify({'error': 'This itinerary has no day-by-day sections to resize'}), 400
+            last_day = day_sections[-1]
+            if target_days < last_day['day']:
+                sections = [s for s in sections if s['day'] is None or s['day'] <= target_days]
+            elif target_days > last_day['day']:
+                new_days_tokens = estimate_section_tokens(last_day['text'], target_days - last_day['day'] - 1)
+                jobs.append((
+                    None,
+                    itinerary_edits.build_new_days_prompt(last_day['day'] + 1, target_days, last_day, itinerary),
+                    new_days_tokens
+                ))
+                new_days = last_day
+        
+        owner = current_usage_owner()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            rewritten = list(pool.map(
+                lambda job: with_usage_owner(owner, call_openrouter, job[1], max_tokens=job[2]), jobs
+            ))
+        for (section, _, _), text in zip(jobs, rewritten):
+            if section is None:
+                if not new_days['text'].endswith('\n'):
+                    # The last day can end the document without a newline; the new
+                    # days' heading must start on a line of its own
+                    new_days['text'] += '\n\n'
+                sections.insert(sections.index(new_days) + 1, {
+                    'key': 'new-days', 'title': 'New days', 'day': None,
+                    'text': itinerary_edits.replace_text(new_days, text, keep_heading=False)
+                })
+            else:
+                section['text'] = itinerary_edits.replace_text(section, text)
+        
+        itinerary['content'] = itinerary_edits.join_sections(sections)
+        if change['type'] == 'budget' and change.get('budget'):
+            itinerary['budget'] = change['budget']
+        elif change['type'] == 'interests':
+            itinerary['interests'] = change.get('interests') or []
+        elif change['type'] == 'days':
+            itinerary['days'] = target_days
+        
+        # Sections were generated without holding the lock, so only save if
+        # the itinerary was not changed or deleted in the meantime
+        with users_db_lock():
+            users_db = load_users_db()
+            itineraries = users_db.get(email, {}).get('itineraries', [])
+            current = next((it for it in itineraries if it.get('id') == itinerary_id), None)
+            if current != record:
+                return jsonify({'error': 'Itinerary was changed while being edited, please retry'}), 409
+            current.clear()
+            current.update(store_itinerary_content(dict(itinerary)))
+            saved = save_users_db(users_db)
+            blob_store.release([record.get('contentRef')] if saved else [current['contentRef']])
+        if not saved:
+            return jsonify({
+                'error': 'Failed to save itinerary',
+                'details': 'Database write error'
+            }), 500
+        update_search_index(search_index.index_itinerary, email, itinerary)
+        
+        return jsonify({
+            'success': True,
+            'itinerary': itinerary,
+            'diff': itinerary_edits.text_diff(original, itinerary['content']),
+            'changedSections': [section['title'] if section else 'New days' for section, _, _ in jobs],
+            'maxTokens': sum(max_tokens for _, _, max_tokens in jobs),
+            'fullRegenerationMaxTokens': estimate_itinerary_tokens(
+                itinerary.get('days'), itinerary.get('interests')
+            )
+        })
+        
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e, 'Itinerary editing is temporarily unavailable')
+    except Exception as e:
+        print(f"Error editing itinerary: {str(e)}")
+        return jsonify({
+            'error': 'Failed to edit itinerary',
+            'details': str(e)
+        }), 500
+
+@api.route('/api/user/itineraries', methods=['GET'])
 def get_user_itineraries():
     """
     Get all saved itineraries for a user
@@ -686,7 +1679,7 @@ def get_user_itineraries():
         
         users_db = load_users_db()
         user_data = users_db.get(email, {})
-        itineraries = user_data.get('itineraries', [])
+        itineraries = hydrate_itineraries(user_data.get('itineraries', []))
         
         return jsonify({
             'success': True,
@@ -700,7 +1693,68 @@ def get_user_itineraries():
             'details': str(e)
         }), 500
 
-@app.route('/api/user/delete-itinerary', methods=['POST'])
+@api.route('/api/user/usage', methods=['GET'])
+def get_user_usage():
+    """
+    A user's token usage today and per day over the last 30 days
+    """
+    email = request.args.get('email', '').strip().lower()
+    if not email:
+        return jsonify({'error': 'Email is required'}), 400
+    
+    user = f"email:{email}"
+    since = time.strftime('%Y-%m-%d', time.gmtime(time.time() - 30 * 86400))
+    used = ledger.tokens_today(user)
+    return jsonify({
+        'success': True,
+        'tokensToday': used,
+        'dailyQuota': USER_DAILY_TOKEN_QUOTA or None,
+        'remainingToday': max(0, USER_DAILY_TOKEN_QUOTA - used) if USER_DAILY_TOKEN_QUOTA else None,
+        'days': ledger.rollup(group_by=('day',), since=since, user=user, limit=31)
+    })
+
+@api.route('/api/user/search', methods=['GET'])
+def search_itineraries():
+    """
+    Full-text search over saved itineraries.
+    scope=user (default) searches the given user's itineraries;
+    scope=global searches everyone's and requires admin access.
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        scope = request.args.get('scope', 'user')
+        email = request.args.get('email', '').strip()
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        
+        if not query:
+            return jsonify({'error': 'Query is required'}), 400
+        
+        if scope == 'global':
+            if not is_admin_request():
+                return jsonify({'error': 'Admin access required'}), 403
+            results = search_index.search(query, limit=limit)
+        elif scope == 'user':
+            if not email:
+                return jsonify({'error': 'Email is required'}), 400
+            results = search_index.search(query, email=email, limit=limit)
+            for result in results:
+                del result['email']
+        else:
+            return jsonify({'error': 'Scope must be user or global'}), 400
+        
+        return jsonify({
+            'success': True,
+            'results': results
+        })
+        
+    except Exception as e:
+        print(f"Error searching itineraries: {str(e)}")
+        return jsonify({
+            'error': 'Failed to search itineraries',
+            'details': str(e)
+        }), 500
+
+@api.route('/api/user/delete-itinerary', methods=['POST'])
 def delete_itinerary():
     """
     Delete a saved itinerary
@@ -713,18 +1767,25 @@ def delete_itinerary():
         if not email or not itinerary_id:
             return jsonify({'error': 'Email and itinerary ID are required'}), 400
         
-        users_db = load_users_db()
-        if email in users_db and 'itineraries' in users_db[email]:
-            users_db[email]['itineraries'] = [
-                it for it in users_db[email]['itineraries'] 
-                if it.get('id') != itinerary_id
-            ]
-            
-            if save_users_db(users_db):
-                return jsonify({
-                    'success': True,
-                    'message': 'Itinerary deleted successfully'
-                })
+        with users_db_lock():
+            users_db = load_users_db()
+            saved = False
+            if email in users_db and 'itineraries' in users_db[email]:
+                removed = [it for it in users_db[email]['itineraries'] if it.get('id') == itinerary_id]
+                users_db[email]['itineraries'] = [
+                    it for it in users_db[email]['itineraries'] 
+                    if it.get('id') != itinerary_id
+                ]
+                saved = save_users_db(users_db)
+                if saved:
+                    blob_store.release([it.get('contentRef') for it in removed])
+        
+        if saved:
+            update_search_index(search_index.remove_itineraries, email, [itinerary_id])
+            return jsonify({
+                'success': True,
+                'message': 'Itinerary deleted successfully'
+            })
         
         return jsonify({
             'error': 'Itinerary not found'
@@ -737,6 +1798,49 @@ def delete_itinerary():
             'details': str(e)
         }), 500
 
+def create_app():
+    """
+    Build the Flask app. Importing this module starts no threads and opens
+    no database connections (its only I/O is load_dotenv() reading .env),
+    so it is safe to load in the gunicorn master with --preload and fork.
+    """
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+    if TRUSTED_PROXY_COUNT:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT)
+    CORS(app)
+
+    # Flask-Mail configuration
+    app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 465))
+    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'False') == 'True'
+    app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', 'True') == 'True'
+    app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
+    app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
+    app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
+
+    profiler.init_app(app, is_admin_request)
+    app.register_blueprint(api)
+
+    # Verify API key is set
+    if not OPENROUTER_API_KEY:
+        print("WARNING: OPENROUTER_API_KEY not set. Please add it to .env file")
+
+    if not UNSPLASH_ACCESS_KEY:
+        print("WARNING: UNSPLASH_ACCESS_KEY not set. Image fetching will use fallback images.")
+
+    return app
+
+def warm_up():
+    """
+    Load the lazily imported dependencies. Called in the gunicorn master
+    when preloading so forked workers start with them in memory.
+    """
+    requests.Session
+    import flask_mail  # noqa: F401
+
+app = create_app()
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     # Set FLASK_DEBUG=false in production (Render environment variables)
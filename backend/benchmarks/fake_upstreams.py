@@ -0,0 +1,214 @@
+"""
+Local stand-ins for the services the backend talks to: OpenRouter, Unsplash
+and an SMTP server. They let the API be load-tested offline without keys.
+"""
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOREM = (
+    "Morning: visit the old town and grab breakfast at a local cafe. "
+    "Afternoon: explore the main museum and walk along the river. "
+    "Evening: dinner at a family-run restaurant followed by a night market. "
+)
+
+
+class LatencyModel:
+    """
+    Latency distribution for fake responses, in seconds.
+    kind is one of 'fixed', 'uniform' or 'lognormal'.
+    """
+
+    def __init__(self, kind='lognormal', mean=1.0, spread=0.5):
+        self.kind = kind
+        self.mean = mean
+        self.spread = spread
+
+    def sample(self) -> float:
+        if self.kind == 'fixed':
+            return self.mean
+        if self.kind == 'uniform':
+            return max(0.0, random.uniform(self.mean - self.spread, self.mean + self.spread))
+        # Lognormal with the requested median; spread is sigma
+        return self.mean * random.lognormvariate(0, self.spread)
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, extra_headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _openrouter_handler(latency, error_rate, tokens_per_second, truncation_rate):
+    class Handler(_QuietHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request_data = json.loads(self.rfile.read(length) or b'{}')
+            self.server.stats['requests'] += 1
+
+            if random.random() < error_rate:
+                self.server.stats['rate_limited'] += 1
+                self._send_json(429, {'error': {'message': 'Rate limit exceeded'}}, {'Retry-After': '1'})
+                return
+
+            max_tokens = int(request_data.get('max_tokens', 500))
+            # A truncated reply uses the whole budget and stops with finish_reason 'length'
+            truncated = random.random() < truncation_rate
+            if truncated:
+                self.server.stats['truncated'] += 1
+                completion_tokens = max_tokens
+            else:
+                completion_tokens = random.randint(max(1, max_tokens // 2), max_tokens)
+            finish_reason = 'length' if truncated else 'stop'
+            # Roughly 4 characters per token
+            content = (LOREM * (completion_tokens * 4 // len(LOREM) + 1))[:completion_tokens * 4]
+            prompt_tokens = sum(len(m.get('content', '')) for m in request_data.get('messages', [])) // 4
+            usage = {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+
+            if request_data.get('stream'):
+                self._stream(content, usage, finish_reason, latency.sample())
+                return
+
+            delay = latency.sample()
+            if tokens_per_second:
+                delay += completion_tokens / tokens_per_second
+            time.sleep(delay)
+            self._send_json(200, {
+                'id': 'fake-completion',
+                'model': request_data.get('model', 'fake'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': finish_reason
+                }],
+                'usage': usage
+            })
+
+        def _stream(self, content, usage, finish_reason, first_token_delay):
+            time.sleep(first_token_delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            chunk_size = 64
+            chunk_delay = chunk_size / 4 / tokens_per_second if tokens_per_second else 0
+            for start in range(0, len(content), chunk_size):
+                event = {'choices': [{'index': 0, 'delta': {'content': content[start:start + chunk_size]}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+                if chunk_delay:
+                    time.sleep(chunk_delay)
+            final = {'choices': [{'index': 0, 'delta': {}, 'finish_reason': finish_reason}], 'usage': usage}
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+            self.close_connection = True
+
+    return Handler
+
+
+def _unsplash_handler(latency):
+    class Handler(_QuietHandler):
+        def do_GET(self):
+            self.server.stats['requests'] += 1
+            time.sleep(latency.sample())
+            results = [{
+                'description': 'City skyline',
+                'alt_description': 'travel landmark',
+                'urls': {
+                    'regular': f'https://images.example.test/photo-{i}?w=1080',
+                    'small': f'https://images.example.test/photo-{i}?w=400'
+                }
+            } for i in range(3)]
+            self._send_json(200, {'total': 3, 'results': results})
+
+    return Handler
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough of SMTP for smtplib.SMTP.sendmail to succeed"""
+
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self._reply('220 fake-smtp ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.wfile.write(b"250-fake-smtp\r\n250 AUTH PLAIN LOGIN\r\n")
+            elif command.startswith('AUTH'):
+                self._reply('235 Authentication successful')
+            elif command == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                self.server.stats['messages'] += 1
+                self._reply('250 OK')
+            elif command == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('250 OK')
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _start(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def start_openrouter(latency=None, error_rate=0.0, tokens_per_second=0, truncation_rate=0.0, port=0):
+    """
+    Start a fake OpenRouter API; returns the server (base URL in server.url).
+    truncation_rate is the fraction of completions cut off at max_tokens.
+    """
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', port),
+        _openrouter_handler(latency or LatencyModel(), error_rate, tokens_per_second, truncation_rate)
+    )
+    server.daemon_threads = True
+    server.stats = {'requests': 0, 'rate_limited': 0, 'truncated': 0}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    return _start(server)
+
+
+def start_unsplash(latency=None, port=0):
+    """Start a fake Unsplash search API; returns the server (search URL in server.url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), _unsplash_handler(latency or LatencyModel('fixed', 0.05)))
+    server.daemon_threads = True
+    server.stats = {'requests': 0}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/search/photos"
+    return _start(server)
+
+
+def start_smtp(port=0):
+    """Start a fake plain-text SMTP server; returns the server (port in server.port)"""
+    server = _ThreadingTCPServer(('127.0.0.1', port), _SMTPHandler)
+    server.stats = {'messages': 0}
+    server.port = server.server_address[1]
+    return _start(server)
@@ -0,0 +1,32 @@
+"""
+Throwaway data paths for benchmarks, so a run never touches the real users
+database, blob store or any other local state. Add new app data files to
+DATA_FILES here rather than to each benchmark.
+"""
+import os
+import tempfile
+
+# Environment variable -> file or directory name inside the temp dir
+DATA_FILES = {
+    'USERS_DB_FILE': 'users_db.json',
+    'PREGENERATED_DB_FILE': 'pregenerated.db',
+    'RATE_LIMIT_DB_FILE': 'rate_limits.db',
+    'SEARCH_INDEX_FILE': 'search_index.db',
+    'BLOB_STORE_FILE': 'blobs.db',
+    'USAGE_DB_FILE': 'usage.db',
+    'UPLOAD_FOLDER': 'uploads',
+    'IMPORT_STAGING_DIR': 'imports',
+}
+
+
+def data_paths(prefix='bench-'):
+    """Environment variables pointing every app data file into a new temp dir"""
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    # The import staging dir is not created by the app
+    os.makedirs(os.path.join(workdir, DATA_FILES['IMPORT_STAGING_DIR']))
+    return {name: os.path.join(workdir, filename) for name, filename in DATA_FILES.items()}
+
+
+def isolated_env(prefix='bench-'):
+    """Copy of os.environ for a subprocess, with data_paths() applied"""
+    return dict(os.environ, **data_paths(prefix))
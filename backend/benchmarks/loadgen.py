@@ -0,0 +1,245 @@
+"""
+End-to-end load test for the Flask API against local fake upstreams.
+
+Starts fake OpenRouter, Unsplash and SMTP servers, points the app at them,
+runs the app in-process (or targets --target URL), drives a weighted mix of
+endpoints with N concurrent clients and prints a JSON report with
+throughput, p50/p95/p99 latency and error rate per endpoint.
+
+Usage (from backend/):
+    python benchmarks/loadgen.py --concurrency 20 --duration 30
+    python benchmarks/loadgen.py --llm-latency lognormal:2:0.4 --error-rate 0.05 --output run.json
+    python benchmarks/loadgen.py --endpoints generate-itinerary --truncation-rate 0.3
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import fake_upstreams
+import isolation
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DESTINATIONS = ['Paris', 'Tokyo', 'Lagos', 'Rome', 'Nairobi', 'Lima', 'Reykjavik', 'Hanoi']
+INTERESTS = ['Food & Dining', 'Culture & History', 'Adventure', 'Nightlife']
+
+
+def _itinerary_body():
+    return {
+        'destination': random.choice(DESTINATIONS),
+        'days': random.choice([1, 2, 3, 5, 7]),
+        'budget': random.choice(['budget', 'moderate', 'luxury']),
+        'interests': random.sample(INTERESTS, random.randint(0, 2))
+    }
+
+
+def _user_email():
+    return f"loadtest-{random.randint(1, 200)}@example.test"
+
+
+# name -> (weight, method, path, request builder)
+SCENARIOS = {
+    'health': (5, 'GET', '/health', lambda: {}),
+    'generate-itinerary': (10, 'POST', '/api/generate-itinerary', lambda: {'json': _itinerary_body()}),
+    'ask-question': (10, 'POST', '/api/ask-question', lambda: {'json': {
+        'question': 'What should I pack?', 'destination': random.choice(DESTINATIONS)}}),
+    'get-location-image': (15, 'POST', '/api/get-location-image', lambda: {'json': {
+        'location': random.choice(DESTINATIONS)}}),
+    'user-itineraries': (40, 'GET', '/api/user/itineraries', lambda: {'params': {'email': _user_email()}}),
+    'save-itinerary': (15, 'POST', '/api/user/save-itinerary', lambda: {'json': dict(
+        _itinerary_body(), email=_user_email(), content='Day 1: ' + 'x' * 2000)}),
+    'send-code': (5, 'POST', '/api/auth/send-code', lambda: {'json': {'email': _user_email()}}),
+}
+
+
+def parse_latency(spec: str) -> fake_upstreams.LatencyModel:
+    """Parse 'kind:mean[:spread]', e.g. 'lognormal:1.5:0.5' or 'fixed:0.2'"""
+    parts = spec.split(':')
+    kind = parts[0]
+    mean = float(parts[1]) if len(parts) > 1 else 1.0
+    spread = float(parts[2]) if len(parts) > 2 else 0.5
+    return fake_upstreams.LatencyModel(kind, mean, spread)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def start_app(args):
+    """Point the app at the fake upstreams and serve it in a background thread"""
+    openrouter = fake_upstreams.start_openrouter(
+        parse_latency(args.llm_latency), args.error_rate, args.tokens_per_second, args.truncation_rate
+    )
+    unsplash = fake_upstreams.start_unsplash(parse_latency(args.image_latency))
+    smtp = fake_upstreams.start_smtp()
+
+    os.environ.update({
+        'OPENROUTER_API_KEY': 'fake-key',
+        'OPENROUTER_BASE_URL': openrouter.url,
+        'UNSPLASH_ACCESS_KEY': 'fake-key',
+        'UNSPLASH_API_URL': unsplash.url,
+        'MAIL_SERVER': '127.0.0.1',
+        'MAIL_PORT': str(smtp.port),
+        'MAIL_USE_SSL': 'False',
+        'MAIL_USE_TLS': 'False',
+        'MAIL_USERNAME': 'loadtest',
+        'MAIL_PASSWORD': 'loadtest',
+        'MAIL_DEFAULT_SENDER': 'loadtest@example.test',
+        **isolation.data_paths('loadtest-'),
+        # All load comes from one IP, so inbound limits are off unless asked for
+        'RATE_LIMIT_ENABLED': 'True' if args.rate_limit else 'False',
+    })
+    sys.path.insert(0, BACKEND_DIR)
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app import app
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    upstreams = {'openrouter': openrouter, 'unsplash': unsplash, 'smtp': smtp}
+    return f"http://127.0.0.1:{server.server_port}", upstreams
+
+
+def run_load(base_url, scenarios, concurrency, duration, total_requests):
+    names = list(scenarios)
+    weights = [scenarios[name][0] for name in names]
+    results = {name: {'latencies': [], 'errors': 0, 'status': {}} for name in names}
+    lock = threading.Lock()
+    issued = [0]
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                if total_requests and issued[0] >= total_requests:
+                    return
+                issued[0] += 1
+            if not total_requests and time.perf_counter() >= deadline:
+                return
+
+            name = random.choices(names, weights)[0]
+            _, method, path, build = scenarios[name]
+            start = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, timeout=120, **build())
+                status = response.status_code
+            except requests.RequestException:
+                status = 'exception'
+            elapsed = time.perf_counter() - start
+
+            with lock:
+                entry = results[name]
+                entry['latencies'].append(elapsed)
+                entry['status'][str(status)] = entry['status'].get(str(status), 0) + 1
+                if status == 'exception' or status >= 500:
+                    entry['errors'] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return results, time.perf_counter() - started
+
+
+def build_report(results, wall_time, config, upstreams=None):
+    endpoints = {}
+    all_latencies = []
+    total_errors = 0
+    for name, entry in results.items():
+        latencies = sorted(entry['latencies'])
+        if not latencies:
+            continue
+        all_latencies.extend(latencies)
+        total_errors += entry['errors']
+        endpoints[name] = {
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / wall_time, 2),
+            'error_rate': round(entry['errors'] / len(latencies), 4),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'status': entry['status']
+        }
+    all_latencies.sort()
+    report = {
+        'config': config,
+        'wall_time_s': round(wall_time, 2),
+        'total': {
+            'requests': len(all_latencies),
+            'throughput_rps': round(len(all_latencies) / wall_time, 2) if wall_time else 0,
+            'error_rate': round(total_errors / len(all_latencies), 4) if all_latencies else 0,
+            'p50_ms': round((percentile(all_latencies, 50) or 0) * 1000, 2),
+            'p95_ms': round((percentile(all_latencies, 95) or 0) * 1000, 2),
+            'p99_ms': round((percentile(all_latencies, 99) or 0) * 1000, 2)
+        },
+        'endpoints': endpoints
+    }
+    if upstreams:
+        report['upstreams'] = {name: dict(server.stats) for name, server in upstreams.items()}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the API against local fake upstreams')
+    parser.add_argument('--target', help='Base URL of an already running API (skips the in-process app)')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=20, help='Seconds to run (ignored with --requests)')
+    parser.add_argument('--requests', type=int, default=0, help='Total requests to issue')
+    parser.add_argument('--endpoints', nargs='+', choices=list(SCENARIOS), help='Only exercise these endpoints')
+    parser.add_argument('--llm-latency', default='lognormal:1.0:0.5', help='kind:mean[:spread] in seconds')
+    parser.add_argument('--image-latency', default='fixed:0.05')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of OpenRouter calls answered with 429')
+    parser.add_argument('--truncation-rate', type=float, default=0.0,
+                        help="Fraction of OpenRouter completions cut off with finish_reason 'length'")
+    parser.add_argument('--tokens-per-second', type=float, default=0,
+                        help='Simulated generation speed (0 = instant)')
+    parser.add_argument('--rate-limit', action='store_true', help='Keep inbound rate limiting enabled')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    upstreams = None
+    if args.target:
+        base_url = args.target.rstrip('/')
+    else:
+        base_url, upstreams = start_app(args)
+
+    scenarios = {name: SCENARIOS[name] for name in (args.endpoints or SCENARIOS)}
+    results, wall_time = run_load(base_url, scenarios, args.concurrency, args.duration, args.requests)
+    report = build_report(results, wall_time, {
+        key: value for key, value in vars(args).items() if key != 'output'
+    }, upstreams)
+    # Truncation/continuation counters, to see whether --truncation-rate was absorbed
+    try:
+        report['generation'] = requests.get(f"{base_url}/health", timeout=10).json().get('generation')
+    except (requests.RequestException, ValueError):
+        pass
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
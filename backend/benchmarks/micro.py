@@ -0,0 +1,208 @@
+"""
+Micro-benchmarks for the CPU-side hot paths in app.py, with regression gating.
+
+Benchmarks run against synthetic data with no network access. Results are
+compared with a stored baseline and the run fails (exit code 1) when any
+benchmark's median is slower than baseline by more than --threshold.
+
+Baselines are machine specific, so record one on the machine that gates:
+
+Usage (from backend/):
+    python benchmarks/micro.py --save-baseline       # record benchmarks/baseline.json
+    python benchmarks/micro.py                       # compare against it
+    python benchmarks/micro.py --only users_db --sizes 1000 10000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+import isolation
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Keep the app away from the real users database and upstream services
+os.environ.update(isolation.data_paths('microbench-'))
+os.environ['UNSPLASH_ACCESS_KEY'] = ''
+os.environ['OPENROUTER_API_KEY'] = ''
+sys.path.insert(0, BACKEND_DIR)
+
+import app  # noqa: E402
+
+INTEREST_OPTIONS = ['Culture & History', 'Food & Dining', 'Adventure', 'Nature & Wildlife',
+                    'Shopping', 'Nightlife', 'Photography', 'Relaxation']
+LOCATIONS = ['Paris', 'Tokyo', 'Lagos, Nigeria', 'Kuala Lumpur', 'Cape Town South Africa',
+             'Reykjavik', 'Hanoi', 'New York City', 'Abuja', 'Small Town Somewhere']
+
+
+# ----- synthetic data -----
+
+def synthetic_itinerary(rng, content_chars=1500):
+    words = ''.join(rng.choices(string.ascii_lowercase + '     \n', k=content_chars))
+    return {
+        'id': str(rng.randint(10 ** 12, 10 ** 13)),
+        'destination': rng.choice(LOCATIONS),
+        'days': rng.randint(1, 10),
+        'budget': rng.choice(['budget', 'moderate', 'luxury']),
+        'content': f"**Day 1**\n\n{words}",
+        'imageUrl': app.FALLBACK_IMAGES['default'],
+        'interests': rng.sample(INTEREST_OPTIONS, rng.randint(0, 3)),
+        'createdAt': '2026-01-01T00:00:00.000Z',
+        'status': 'planned'
+    }
+
+
+def synthetic_users_db(n_users, itineraries_per_user=1, content_chars=400, seed=1):
+    rng = random.Random(seed)
+    return {
+        f"user{i}@example.test": {
+            'email': f"user{i}@example.test",
+            'name': f"User {i}",
+            'avatar': '',
+            'itineraries': [synthetic_itinerary(rng, content_chars) for _ in range(itineraries_per_user)]
+        }
+        for i in range(n_users)
+    }
+
+
+# ----- benchmark runner -----
+
+def measure(fn, repeat, number=1):
+    """Median and min wall time per call, in milliseconds"""
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1000)
+    return {'median_ms': round(statistics.median(samples), 4), 'min_ms': round(min(samples), 4)}
+
+
+def bench_users_db(sizes):
+    results = {}
+    for size in sizes:
+        repeat = 10 if size <= 10000 else 3
+        db = synthetic_users_db(size)
+        app.save_users_db(db)
+        results[f"users_db.load[{size}]"] = measure(app.load_users_db, repeat)
+        results[f"users_db.save[{size}]"] = measure(lambda: app.save_users_db(db), repeat)
+    return results
+
+
+def bench_location_image(sizes):
+    app.UNSPLASH_ACCESS_KEY = None
+    locations = LOCATIONS * 10
+
+    def run():
+        for location in locations:
+            app.fetch_location_image(location)
+
+    return {'fetch_location_image.offline[100]': measure(run, 20)}
+
+
+def bench_prompt(sizes):
+    rng = random.Random(2)
+    params = [(rng.choice(LOCATIONS), rng.randint(1, 10), rng.choice(['budget', 'moderate', 'luxury']),
+               rng.sample(INTEREST_OPTIONS, 3), 'Traveling with kids') for _ in range(1000)]
+
+    def run():
+        for destination, days, budget, interests, notes in params:
+            app.build_itinerary_prompt(destination, days, budget, interests, notes)
+            app.estimate_itinerary_tokens(days, interests, notes)
+
+    return {'generate_itinerary.prompt[1000]': measure(run, 20)}
+
+
+def bench_jsonify(sizes):
+    rng = random.Random(3)
+    results = {}
+    for count in (20, 200):
+        itineraries = [synthetic_itinerary(rng) for _ in range(count)]
+
+        def run():
+            with app.app.test_request_context():
+                app.jsonify({'success': True, 'itineraries': itineraries}).get_data()
+
+        results[f"jsonify.itineraries[{count}]"] = measure(run, 20, number=5)
+    return results
+
+
+BENCHMARKS = {
+    'users_db': bench_users_db,
+    'location_image': bench_location_image,
+    'prompt': bench_prompt,
+    'jsonify': bench_jsonify,
+}
+
+
+def compare(results, baseline, threshold):
+    """Return a list of (name, baseline_ms, current_ms, ratio) regressions"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['median_ms']
+        ratio = result['median_ms'] / before if before else 1.0
+        if ratio > 1 + threshold:
+            regressions.append((name, before, result['median_ms'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for backend hot paths')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                        help='User counts for the users_db benchmarks')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown before failing, as a fraction (0.25 = 25%%)')
+    parser.add_argument('--output', help='Write the JSON results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results.update(BENCHMARKS[name](args.sizes))
+
+    for name, result in results.items():
+        print(f"{name:40s} median {result['median_ms']:10.3f} ms   min {result['min_ms']:10.3f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}:")
+        for name, before, after, ratio in regressions:
+            print(f"   {name}: {before:.3f} ms -> {after:.3f} ms ({ratio:.2f}x)")
+        return 1
+    print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
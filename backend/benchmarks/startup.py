@@ -0,0 +1,117 @@
+"""
+Cold-start benchmark: how long a fresh process takes to import the app and
+answer its first request.
+
+Each run starts a new Python process (so nothing is cached in memory) and
+measures:
+    import_ms          time to `import app`
+    first_request_ms   first GET /health through the test client after import
+    boot_to_response_ms  process spawn until a real HTTP server answers /health
+
+Usage (from backend/):
+    python benchmarks/startup.py --runs 10
+    python benchmarks/startup.py --output startup.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from isolation import isolated_env
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IN_PROCESS = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/health')
+done = time.perf_counter()
+assert response.status_code == 200, response.status_code
+sys.stderr.write(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (done - imported) * 1000
+}) + '\\n')
+"""
+
+SERVE = """
+import sys
+from werkzeug.serving import make_server
+import app
+make_server('127.0.0.1', int(sys.argv[1]), app.app).serve_forever()
+"""
+
+
+def measure_in_process():
+    result = subprocess.run(
+        [sys.executable, '-c', IN_PROCESS], cwd=BACKEND_DIR, env=isolated_env('startup-'),
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True
+    )
+    return json.loads(result.stderr.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def measure_boot(timeout=30):
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVE, str(port)], cwd=BACKEND_DIR, env=isolated_env('startup-'),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.002)
+        raise RuntimeError('Server did not answer /health in time')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(samples):
+    return {
+        'median_ms': round(statistics.median(samples), 2),
+        'min_ms': round(min(samples), 2),
+        'max_ms': round(max(samples), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start benchmark for the Flask app')
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--output', help='Write the JSON results to this file')
+    args = parser.parse_args()
+
+    samples = {'import_ms': [], 'first_request_ms': [], 'boot_to_response_ms': []}
+    for _ in range(args.runs):
+        for name, value in measure_in_process().items():
+            samples[name].append(value)
+        samples['boot_to_response_ms'].append(measure_boot())
+
+    results = {name: summarize(values) for name, values in samples.items()}
+    for name, result in results.items():
+        print(f"{name:22s} median {result['median_ms']:8.1f} ms   min {result['min_ms']:8.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
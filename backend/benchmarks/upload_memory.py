@@ -0,0 +1,174 @@
+"""
+Avatar upload memory benchmark: peak server RSS while many uploads are in
+flight, and how quickly oversized uploads are turned away.
+
+Starts the app in a separate process (one gunicorn worker by default, or
+the threaded dev server), then sends --concurrency uploads of --size-mb at
+once (optionally throttled to simulate slow clients) followed by the same
+number of uploads twice the avatar limit. RSS of the server and its
+workers is sampled from /proc, so this needs Linux. The dev server reads
+and discards the rest of a rejected body after responding, which inflates
+its peak RSS for the oversized wave; gunicorn does not.
+
+Usage (from backend/):
+    python benchmarks/upload_memory.py --concurrency 20 --size-mb 1.9
+    python benchmarks/upload_memory.py --throttle-kbps 256 --output uploads.json
+    python benchmarks/upload_memory.py --server dev
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from isolation import isolated_env
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVE = """
+import sys
+from werkzeug.serving import make_server
+import app
+make_server('127.0.0.1', int(sys.argv[1]), app.app, threaded=True).serve_forever()
+"""
+
+BOUNDARY = 'uploadbenchmark'
+PNG_HEADER = b'\x89PNG\r\n\x1a\n'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid):
+    """RSS of pid plus its child processes (gunicorn workers)"""
+    total = 0.0
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    total += int(line.split()[1]) / 1024
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                total += sum(rss_mb(int(child)) for child in f.read().split())
+    except OSError:
+        pass
+    return total
+
+
+def server_command(server, port):
+    if server == 'dev':
+        return [sys.executable, '-c', SERVE, str(port)]
+    # Picks up gunicorn.conf.py from backend/
+    return [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}', '--workers', '1']
+
+
+def multipart_body(size):
+    head = (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="email"\r\n\r\nbench@example.com\r\n'
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="avatar"; filename="avatar.png"\r\n'
+        'Content-Type: image/png\r\n\r\n'
+    ).encode()
+    return head + PNG_HEADER + b'0' * (size - len(PNG_HEADER)) + f'\r\n--{BOUNDARY}--\r\n'.encode()
+
+
+def upload(port, body, throttle_kbps, results):
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        conn.putrequest('POST', '/api/user/upload-avatar')
+        conn.putheader('Content-Type', f'multipart/form-data; boundary={BOUNDARY}')
+        conn.putheader('Content-Length', str(len(body)))
+        conn.endheaders()
+        step = 64 * 1024
+        for offset in range(0, len(body), step):
+            conn.send(body[offset:offset + step])
+            if throttle_kbps:
+                time.sleep(step / (throttle_kbps * 1024))
+        status = conn.getresponse().status
+    except OSError:
+        # The server may answer and close before the whole body is sent
+        status = 'closed'
+    finally:
+        conn.close()
+    results.append((status, (time.perf_counter() - start) * 1000))
+
+
+def run_wave(port, pid, body, concurrency, throttle_kbps):
+    results, peak = [], [rss_mb(pid)]
+    threads = [threading.Thread(target=upload, args=(port, body, throttle_kbps, results)) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        peak.append(rss_mb(pid))
+        time.sleep(0.01)
+    latencies = [ms for _, ms in results]
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'statuses': statuses,
+        'peak_rss_mb': round(max(peak), 1),
+        'median_ms': round(statistics.median(latencies), 1),
+        'max_ms': round(max(latencies), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory benchmark for streamed avatar uploads')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--size-mb', type=float, default=1.9, help='Size of the accepted uploads')
+    parser.add_argument('--limit-mb', type=float, default=2, help="The server's AVATAR_MAX_BYTES in MB")
+    parser.add_argument('--throttle-kbps', type=int, default=0, help='Per-client upload speed (0 = unthrottled)')
+    parser.add_argument('--server', choices=['gunicorn', 'dev'], default='gunicorn')
+    parser.add_argument('--output', help='Write the JSON results to this file')
+    args = parser.parse_args()
+
+    port = free_port()
+    process = subprocess.Popen(
+        server_command(args.server, port), cwd=BACKEND_DIR, env=isolated_env('uploads-'),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.perf_counter() + 30
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                    break
+            except OSError:
+                if time.perf_counter() > deadline:
+                    raise RuntimeError('Server did not answer /health in time')
+                time.sleep(0.05)
+
+        idle = rss_mb(process.pid)
+        accepted = run_wave(port, process.pid, multipart_body(int(args.size_mb * 1024 * 1024)),
+                            args.concurrency, args.throttle_kbps)
+        oversized = run_wave(port, process.pid, multipart_body(int(args.limit_mb * 2 * 1024 * 1024)),
+                             args.concurrency, args.throttle_kbps)
+    finally:
+        process.terminate()
+        process.wait()
+
+    results = {'idle_rss_mb': round(idle, 1), 'accepted': accepted, 'oversized': oversized}
+    print(f"idle RSS {results['idle_rss_mb']:.1f} MB")
+    for name in ('accepted', 'oversized'):
+        wave = results[name]
+        print(f"{name:10s} peak RSS {wave['peak_rss_mb']:7.1f} MB (+{wave['peak_rss_mb'] - idle:.1f})   "
+              f"median {wave['median_ms']:8.1f} ms   max {wave['max_ms']:8.1f} ms   {wave['statuses']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
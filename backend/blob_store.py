@@ -0,0 +1,131 @@
+"""
+Content-addressed, deduplicated store for itinerary bodies.
+
+Bodies are keyed by the SHA-256 of their text, compressed (zstd when the
+zstandard package is installed, zlib otherwise) and reference counted, so
+user records in users_db.json only hold a short contentRef and identical
+itineraries saved by many users are stored once.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BLOB_STORE_FILE = os.getenv(
+    'BLOB_STORE_FILE',
+    os.path.join(os.path.dirname(__file__), 'blobs.db')
+)
+DEFAULT_CODEC = 'zstd' if zstandard else 'zlib'
+
+_local = threading.local()
+
+
+def _conn():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(BLOB_STORE_FILE, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "hash TEXT PRIMARY KEY, codec TEXT NOT NULL, data BLOB NOT NULL, "
+            "size INTEGER NOT NULL, refcount INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        _local.conn = conn
+    return conn
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _compress(raw: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    return zlib.compress(raw, 9)
+
+
+def _decompress(data: bytes, codec: str) -> str:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('zstandard is required to read zstd-compressed blobs')
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return zlib.decompress(data).decode('utf-8')
+
+
+def _put(conn, text):
+    digest = content_hash(text)
+    updated = conn.execute(
+        "UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?", (digest,)
+    ).rowcount
+    if not updated:
+        raw = text.encode('utf-8')
+        conn.execute(
+            "INSERT INTO blobs VALUES (?, ?, ?, ?, 1)",
+            (digest, DEFAULT_CODEC, _compress(raw, DEFAULT_CODEC), len(raw))
+        )
+    return digest
+
+
+def put(text: str) -> str:
+    """Store text (or add a reference to an identical copy); returns its hash"""
+    conn = _conn()
+    with conn:
+        return _put(conn, text)
+
+
+def put_many(texts) -> list:
+    """put() for every text in one transaction: all references are added or none"""
+    conn = _conn()
+    with conn:
+        return [_put(conn, text) for text in texts]
+
+
+def release(digests):
+    """Drop one reference per hash, deleting blobs nobody references"""
+    digests = [d for d in digests if d]
+    if not digests:
+        return
+    conn = _conn()
+    with conn:
+        conn.executemany("UPDATE blobs SET refcount = refcount - 1 WHERE hash = ?", [(d,) for d in digests])
+        conn.execute("DELETE FROM blobs WHERE refcount <= 0")
+
+
+def get_many(digests) -> dict:
+    """Map of hash -> text for the hashes that exist"""
+    digests = list({d for d in digests if d})
+    if not digests:
+        return {}
+    conn = _conn()
+    texts = {}
+    # Stay under SQLite's bound-parameter limit
+    for start in range(0, len(digests), 500):
+        chunk = digests[start:start + 500]
+        rows = conn.execute(
+            f"SELECT hash, codec, data FROM blobs WHERE hash IN ({','.join('?' * len(chunk))})",
+            chunk
+        )
+        for digest, codec, data in rows:
+            texts[digest] = _decompress(data, codec)
+    return texts
+
+
+def stats() -> dict:
+    row = _conn().execute(
+        "SELECT COUNT(*), COALESCE(SUM(refcount), 0), COALESCE(SUM(size), 0), "
+        "COALESCE(SUM(LENGTH(data)), 0), COALESCE(SUM(size * refcount), 0) FROM blobs"
+    ).fetchone()
+    return {
+        'blobs': row[0],
+        'references': row[1],
+        'uncompressedBytes': row[2],
+        'storedBytes': row[3],
+        'logicalBytes': row[4]
+    }
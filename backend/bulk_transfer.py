@@ -0,0 +1,378 @@
+"""
+Streaming NDJSON export and import of user data.
+
+Export walks users_db.json one user at a time with an incremental parser, so
+memory stays flat regardless of file size, and yields one NDJSON line per
+user and per itinerary (with content read back from the blob store).
+
+Import stages incoming lines in batches into a temporary SQLite file, then
+streams the existing users database into a new file, merging staged users
+and itineraries as it goes, and atomically swaps it in. A job ID makes the
+import resumable: re-sending the same stream under the same job skips lines
+already staged.
+
+Record format:
+    {"type": "user", "cursor": 12, "email": ..., "name": ..., "avatar": ...}
+    {"type": "itinerary", "email": ..., "id": ..., "content": ..., ...}
+
+Usage (from backend/):
+    python bulk_transfer.py export users.ndjson [--since 2026-01-01] [--email a@b.c]
+    python bulk_transfer.py import users.ndjson [--job nightly] [--mode replace]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import uuid
+
+CHUNK_SIZE = 1 << 16
+IMPORT_BATCH_SIZE = 500
+# Lines fingerprinted to recognise the body a resumed job started with
+PREFIX_LINES = 100
+STAGING_DIR = os.getenv('IMPORT_STAGING_DIR', tempfile.gettempdir())
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_users(path):
+    """
+    Yield (email, user) pairs from a users database file without loading
+    the whole document
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as f:
+        buffer = f.read(CHUNK_SIZE)
+        eof = not buffer
+        pos = 0
+
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def skip(chars):
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                fill()
+
+        def decode():
+            nonlocal pos
+            while True:
+                try:
+                    value, end = _decoder.raw_decode(buffer, pos)
+                    # A number or literal may continue into the next chunk
+                    if end < len(buffer) or eof:
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+
+        skip(_WHITESPACE)
+        if pos >= len(buffer) or buffer[pos] != '{':
+            raise ValueError('Users database must be a JSON object')
+        pos += 1
+        while True:
+            skip(_WHITESPACE + ',')
+            if pos >= len(buffer):
+                raise ValueError('Unexpected end of users database')
+            if buffer[pos] == '}':
+                return
+            email = decode()
+            skip(_WHITESPACE + ':')
+            yield email, decode()
+
+
+def export_records(path, hydrate_itineraries, since=None, until=None, emails=None, cursor=0):
+    """
+    Yield user and itinerary records. since/until filter itineraries by
+    createdAt (ISO strings compare in date order); cursor skips users
+    already exported by an interrupted run.
+    """
+    emails = set(emails) if emails else None
+    for index, (email, user) in enumerate(iter_users(path), start=1):
+        if index <= cursor or (emails is not None and email not in emails):
+            continue
+        itineraries = [
+            it for it in user.get('itineraries', [])
+            if (not since or it.get('createdAt', '') >= since) and (not until or it.get('createdAt', '') < until)
+        ]
+        if (since or until) and not itineraries:
+            continue
+        profile = {key: value for key, value in user.items() if key != 'itineraries'}
+        yield dict(profile, type='user', cursor=index, email=email)
+        for itinerary in hydrate_itineraries(itineraries):
+            yield dict(itinerary, type='itinerary', email=email)
+
+
+def to_ndjson(records):
+    for record in records:
+        yield json.dumps(record, separators=(',', ':')) + '\n'
+
+
+class ImportMismatch(ValueError):
+    """A job was resumed with a body that does not match what it staged"""
+
+
+class ImportJob:
+    """Staged, resumable import of NDJSON user records"""
+
+    def __init__(self, job_id):
+        safe_id = ''.join(c for c in str(job_id) if c.isalnum() or c in '-_') or 'default'
+        self.path = os.path.join(STAGING_DIR, f"import-{safe_id}.db")
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+            CREATE TABLE IF NOT EXISTS users (email TEXT PRIMARY KEY, profile TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS itineraries (
+                email TEXT NOT NULL, id TEXT NOT NULL, record TEXT NOT NULL, PRIMARY KEY (email, id));
+            CREATE TABLE IF NOT EXISTS released (content_ref TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS dropped (email TEXT NOT NULL, ids TEXT NOT NULL);
+        """)
+
+    def _meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, **values):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", values.items())
+
+    @property
+    def lines_staged(self):
+        return self._meta('lines') or 0
+
+    def stage(self, lines, batch_size=IMPORT_BATCH_SIZE):
+        """
+        Stage NDJSON lines in batches, skipping lines a previous attempt of
+        this job already staged. The first PREFIX_LINES lines are
+        fingerprinted, and resuming with a body whose prefix differs raises
+        ImportMismatch. Returns (lines staged now, invalid lines).
+        """
+        skip = self.lines_staged
+        expected_hash, expected_lines = self._meta('prefix_hash'), self._meta('prefix_lines') or 0
+        prefix = hashlib.sha256()
+        seen = staged = invalid = 0
+        users, itineraries = [], []
+
+        def flush():
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO users VALUES (?, ?)", users)
+                self.conn.executemany("INSERT OR REPLACE INTO itineraries VALUES (?, ?, ?)", itineraries)
+                values = {'lines': seen}
+                if not expected_hash:
+                    values.update(prefix_lines=min(seen, PREFIX_LINES), prefix_hash=prefix.hexdigest())
+                self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", values.items())
+            users.clear()
+            itineraries.clear()
+
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            seen += 1
+            if seen <= PREFIX_LINES:
+                prefix.update(line.strip().encode('utf-8') + b'\n')
+                if seen == expected_lines and prefix.hexdigest() != expected_hash:
+                    raise ImportMismatch('Import body does not match the one this job started with')
+            if seen <= skip:
+                continue
+            try:
+                record = json.loads(line)
+                email = record.pop('email')
+                record_type = record.pop('type')
+            except (ValueError, KeyError, AttributeError):
+                invalid += 1
+                continue
+            record.pop('cursor', None)
+            if record_type == 'user':
+                users.append((email, json.dumps(record)))
+            elif record_type == 'itinerary' and record.get('id') is not None:
+                itineraries.append((email, str(record['id']), json.dumps(record)))
+            else:
+                invalid += 1
+                continue
+            staged += 1
+            if len(users) + len(itineraries) >= batch_size:
+                flush()
+        if seen < skip:
+            raise ImportMismatch('Import body is shorter than what this job already staged')
+        flush()
+        return staged, invalid
+
+    def _staged_itineraries(self, email=None):
+        if email is None:
+            rows = self.conn.execute("SELECT email, record FROM itineraries ORDER BY rowid")
+        else:
+            rows = self.conn.execute(
+                "SELECT email, record FROM itineraries WHERE email = ? ORDER BY rowid", (email,)
+            )
+        for email, record in rows:
+            yield email, json.loads(record)
+
+    def _merge_user(self, email, existing, content_hash):
+        row = self.conn.execute("SELECT profile FROM users WHERE email = ?", (email,)).fetchone()
+        user = dict(existing or {'email': email, 'name': '', 'avatar': ''})
+        if row:
+            user.update(json.loads(row[0]))
+        incoming = []
+        for _, itinerary in self._staged_itineraries(email):
+            # The blob itself is stored once the new file is in place
+            itinerary['contentRef'] = content_hash(itinerary.pop('content', '') or '')
+            incoming.append(itinerary)
+        if incoming:
+            incoming_ids = {str(it['id']) for it in incoming}
+            kept = []
+            for itinerary in user.get('itineraries', []):
+                if str(itinerary.get('id')) in incoming_ids:
+                    self.conn.execute("INSERT INTO released VALUES (?)", (itinerary.get('contentRef'),))
+                else:
+                    kept.append(itinerary)
+            user['itineraries'] = incoming + kept
+        user['email'] = email
+        return user
+
+    def _write_merged(self, users_db_path, content_hash, replace):
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS merged (email TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM merged")
+        self.conn.execute("DELETE FROM released")
+        self.conn.execute("DELETE FROM dropped")
+        written = 0
+        directory = os.path.dirname(os.path.abspath(users_db_path))
+        fd, temp_path = tempfile.mkstemp(prefix='users_db-', suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as out:
+                out.write('{')
+
+                def write(email, user):
+                    nonlocal written
+                    out.write(',\n  ' if written else '\n  ')
+                    out.write(f"{json.dumps(email)}: {json.dumps(user)}")
+                    written += 1
+
+                for email, user in iter_users(users_db_path):
+                    staged = self.conn.execute(
+                        "SELECT 1 FROM users WHERE email = ? UNION SELECT 1 FROM itineraries WHERE email = ?",
+                        (email, email)
+                    ).fetchone()
+                    if staged:
+                        self.conn.execute("INSERT OR IGNORE INTO merged VALUES (?)", (email,))
+                        write(email, self._merge_user(email, user, content_hash))
+                    elif replace:
+                        itineraries = user.get('itineraries', [])
+                        self.conn.executemany("INSERT INTO released VALUES (?)",
+                                              [(it.get('contentRef'),) for it in itineraries])
+                        self.conn.execute("INSERT INTO dropped VALUES (?, ?)",
+                                          (email, json.dumps([it.get('id') for it in itineraries])))
+                    else:
+                        write(email, user)
+
+                new_emails = self.conn.execute(
+                    "SELECT email FROM users UNION SELECT email FROM itineraries "
+                    "EXCEPT SELECT email FROM merged"
+                ).fetchall()
+                for (email,) in new_emails:
+                    write(email, self._merge_user(email, None, content_hash))
+                out.write('\n}\n')
+            self.conn.commit()
+            os.replace(temp_path, users_db_path)
+        except Exception:
+            self.conn.rollback()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return written
+
+    def merge(self, users_db_path, content_hash, put_many, release, on_itinerary=lambda email, it: None,
+              on_drop=lambda email, ids: None, replace=False):
+        """
+        Write a new users database merging staged records into the existing
+        one, streaming both sides, and swap it in. With replace, users
+        missing from the import are dropped. The caller must hold the users
+        database lock. Returns counts.
+
+        Blob references for imported itineraries are only added, and those
+        of replaced ones released, after the swap. Each step is recorded in
+        the job, so re-running a job that failed part way continues from the
+        step that failed instead of merging or counting references twice.
+        """
+        if self._meta('merged_users') is None:
+            self._set_meta(merged_users=self._write_merged(users_db_path, content_hash, replace))
+        if not self._meta('stored'):
+            # One transaction: either every imported body gains its reference or none does
+            put_many(it.get('content', '') or '' for _, it in self._staged_itineraries())
+            self._set_meta(stored=1)
+        if not self._meta('released'):
+            release([ref for (ref,) in self.conn.execute("SELECT content_ref FROM released")])
+            self._set_meta(released=1)
+        for email, ids in self.conn.execute("SELECT email, ids FROM dropped"):
+            on_drop(email, json.loads(ids))
+        for email, itinerary in self._staged_itineraries():
+            on_itinerary(email, itinerary)
+        return {'users': self._meta('merged_users')}
+
+    def close(self, remove=False):
+        self.conn.close()
+        if remove:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+
+
+def new_job_id():
+    return uuid.uuid4().hex[:16]
+
+
+def main():
+    from app import USERS_DB_FILE, hydrate_itineraries, run_import
+
+    parser = argparse.ArgumentParser(description='Bulk NDJSON export/import of user data')
+    sub = parser.add_subparsers(dest='command', required=True)
+    export_parser = sub.add_parser('export')
+    export_parser.add_argument('output', help="NDJSON file to write ('-' for stdout)")
+    export_parser.add_argument('--since')
+    export_parser.add_argument('--until')
+    export_parser.add_argument('--email', action='append')
+    export_parser.add_argument('--cursor', type=int, default=0, help='Resume after this many users')
+    import_parser = sub.add_parser('import')
+    import_parser.add_argument('input', help="NDJSON file to read ('-' for stdin)")
+    import_parser.add_argument('--job', help='Job ID; re-running a job resumes it (default: a new job)')
+    import_parser.add_argument('--mode', choices=['merge', 'replace'], default='merge')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        out = sys.stdout if args.output == '-' else open(args.output, 'w')
+        try:
+            records = export_records(USERS_DB_FILE, hydrate_itineraries, args.since, args.until,
+                                     args.email, args.cursor)
+            out.writelines(to_ndjson(records))
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    else:
+        source = sys.stdin if args.input == '-' else open(args.input, 'r')
+        try:
+            job_id = args.job or new_job_id()
+            print(f"Import job {job_id}", file=sys.stderr)
+            print(json.dumps(run_import(source, job_id, replace=args.mode == 'replace')), file=sys.stderr)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+
+if __name__ == '__main__':
+    main()
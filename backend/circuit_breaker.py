@@ -0,0 +1,109 @@
+"""
+Per-upstream circuit breaker (closed / open / half-open).
+
+The breaker tracks the outcome of the last window_size calls. A call counts
+as failed when it raises or takes longer than slow_call_seconds. Once the
+failure rate over at least min_calls reaches failure_rate, the breaker opens
+and calls are rejected immediately for open_seconds. After that a single
+trial call is let through (half-open): success closes the breaker, failure
+opens it again.
+"""
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is temporarily unavailable (circuit open)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_rate=0.5, slow_call_seconds=10.0,
+                 window_size=20, min_calls=5, open_seconds=30.0):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+        print(f"⚠️ Circuit for {self.name} opened")
+
+    def retry_after(self) -> int:
+        """Seconds until the breaker lets a trial call through"""
+        if self.state != OPEN:
+            return 0
+        return max(1, int(self.open_seconds - (time.monotonic() - self._opened_at)) + 1)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self._rejected += 1
+                    return False
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self._rejected += 1
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record(self, success: bool, duration: float):
+        failed = not success or duration >= self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+                if failed:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    print(f"✅ Circuit for {self.name} closed")
+                return
+            self._outcomes.append(failed)
+            if (self.state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate):
+                self._open()
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker, raising UpstreamUnavailable while open"""
+        if not self.allow():
+            raise UpstreamUnavailable(self.name, self.retry_after())
+        start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record(False, time.monotonic() - start)
+            raise
+        self.record(True, time.monotonic() - start)
+        return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                'state': self.state,
+                'recentCalls': calls,
+                'failureRate': round(sum(self._outcomes) / calls, 3) if calls else 0.0,
+                'rejected': self._rejected,
+                'retryAfter': self.retry_after()
+            }
@@ -0,0 +1,22 @@
+import threading
+
+import pytest
+
+import app as app_module
+import blob_store
+import rate_limit
+import search_index
+import usage_ledger
+
+
+@pytest.fixture
+def isolated_app(tmp_path, monkeypatch):
+    """The app module with its users database, blob store, search index and usage ledger in tmp_path"""
+    monkeypatch.setattr(app_module, 'USERS_DB_FILE', str(tmp_path / 'users_db.json'))
+    monkeypatch.setattr(blob_store, 'BLOB_STORE_FILE', str(tmp_path / 'blobs.db'))
+    monkeypatch.setattr(blob_store, '_local', threading.local())
+    monkeypatch.setattr(search_index, 'SEARCH_INDEX_FILE', str(tmp_path / 'search_index.db'))
+    monkeypatch.setattr(search_index, '_local', threading.local())
+    monkeypatch.setattr(app_module, 'ledger', usage_ledger.UsageLedger(str(tmp_path / 'usage.db')))
+    monkeypatch.setattr(rate_limit, 'RATE_LIMIT_ENABLED', False)
+    return app_module
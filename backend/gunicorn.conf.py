@@ -0,0 +1,25 @@
+"""
+Gunicorn settings, picked up automatically when gunicorn runs from backend/.
+
+With preload the app is imported once in the master and workers are forked
+from it, so each extra worker starts without importing Flask again. Apart
+from reading .env, app.py opens no files or connections and starts no
+threads at import time, which is what makes forking after the import
+safe. Set GUNICORN_PRELOAD=False to import in each worker instead.
+
+Workers are threaded so a slow client (e.g. an avatar upload on a poor
+connection) ties up one thread rather than a whole worker process.
+"""
+import os
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+# rate_limit.py sizes the generation queue from the same variable
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+
+def when_ready(server):
+    # Runs in the master before workers are forked
+    if preload_app:
+        import app
+        app.warm_up()
@@ -0,0 +1,149 @@
+"""
+Fixed-memory, time-decayed heavy-hitter tracking for request traffic.
+
+Each dimension (destinations, trip shapes, questions, ...) keeps two
+Space-Saving summaries: a fast one (short half-life) to spot keys that are
+hot right now and a slow one for the longer trend. Counts decay
+exponentially using forward decay: each hit is weighted by
+exp(rate * (t - landmark)), so stored counters never need rescanning and
+ranking is unaffected by the decay. Memory is capacity counters per
+summary regardless of how many distinct keys are seen.
+
+Counts are per process; each gunicorn worker sees its share of traffic.
+"""
+import math
+import threading
+import time
+
+# Rescale stored counters before weights grow large enough to lose precision
+MAX_LOG_WEIGHT = 200.0
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-K summary with exponential time decay. A key's
+    estimated count overshoots its true (decayed) count by at most its
+    recorded error.
+    """
+
+    def __init__(self, capacity, half_life, clock=time.monotonic):
+        self.capacity = capacity
+        self.rate = math.log(2) / half_life
+        self.clock = clock
+        self.landmark = clock()
+        self.counters = {}  # key -> [weighted count, weighted error]
+
+    def _weight(self, now):
+        exponent = self.rate * (now - self.landmark)
+        if exponent > MAX_LOG_WEIGHT:
+            scale = math.exp(-exponent)
+            for counter in self.counters.values():
+                counter[0] *= scale
+                counter[1] *= scale
+            self.landmark = now
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def add(self, key, now=None):
+        """Count one hit; returns the key's current decayed estimate"""
+        now = self.clock() if now is None else now
+        weight = self._weight(now)
+        counter = self.counters.get(key)
+        if counter is None:
+            if len(self.counters) < self.capacity:
+                counter = self.counters[key] = [0.0, 0.0]
+            else:
+                # Take over the smallest counter, inheriting its count as error
+                victim = min(self.counters, key=lambda k: self.counters[k][0])
+                floor = self.counters.pop(victim)[0]
+                counter = self.counters[key] = [floor, floor]
+        counter[0] += weight
+        return counter[0] / weight
+
+    def estimate(self, key, now=None):
+        counter = self.counters.get(key)
+        if counter is None:
+            return 0.0
+        now = self.clock() if now is None else now
+        return counter[0] / self._weight(now)
+
+    def top(self, k, now=None):
+        """[(key, decayed count, decayed error)] for the k heaviest keys"""
+        now = self.clock() if now is None else now
+        weight = self._weight(now)
+        ranked = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)[:k]
+        return [(key, count / weight, error / weight) for key, (count, error) in ranked]
+
+    def clear(self):
+        self.counters.clear()
+        self.landmark = self.clock()
+
+
+class HotKeyTracker:
+    """
+    Fast and slow Space-Saving summaries per dimension. When a key's fast
+    count reaches hot_threshold, on_hot(dimension, key) is called, at most
+    once per cooldown seconds per key.
+    """
+
+    def __init__(self, dimensions, capacity=200, fast_half_life=900, slow_half_life=86400,
+                 hot_threshold=20, cooldown=21600, on_hot=None, clock=time.monotonic):
+        self.clock = clock
+        self.hot_threshold = hot_threshold
+        self.cooldown = cooldown
+        self.on_hot = on_hot
+        self.fast = {d: SpaceSaving(capacity, fast_half_life, clock) for d in dimensions}
+        self.slow = {d: SpaceSaving(capacity, slow_half_life, clock) for d in dimensions}
+        self.fast_half_life = fast_half_life
+        self.slow_half_life = slow_half_life
+        self._fired = {}  # (dimension, key) -> time on_hot last fired
+        self._lock = threading.Lock()
+
+    def record(self, dimension, key):
+        if key is None or key == '':
+            return
+        now = self.clock()
+        fire = False
+        with self._lock:
+            fast_count = self.fast[dimension].add(key, now)
+            self.slow[dimension].add(key, now)
+            if self.on_hot and fast_count >= self.hot_threshold:
+                last = self._fired.get((dimension, key))
+                if last is None or now - last >= self.cooldown:
+                    self._fired[(dimension, key)] = now
+                    fire = True
+                    if len(self._fired) > 4 * sum(s.capacity for s in self.fast.values()):
+                        self._fired = {k: t for k, t in self._fired.items() if now - t < self.cooldown}
+        if fire:
+            self.on_hot(dimension, key)
+
+    def top(self, dimension, k, window='fast'):
+        """[(key, decayed count, decayed error)] for the k heaviest keys of one dimension"""
+        summaries = self.fast if window == 'fast' else self.slow
+        with self._lock:
+            return summaries[dimension].top(k)
+
+    def snapshot(self, k=20):
+        """Top-k per dimension for both windows"""
+        now = self.clock()
+        with self._lock:
+            result = {}
+            for dimension in self.fast:
+                result[dimension] = {
+                    'recent': self._rows(self.fast[dimension].top(k, now)),
+                    'trend': self._rows(self.slow[dimension].top(k, now)),
+                }
+        return result
+
+    @staticmethod
+    def _rows(entries):
+        return [
+            {'key': key, 'count': round(count, 2), 'maxError': round(error, 2)}
+            for key, count, error in entries
+        ]
+
+    def clear(self):
+        with self._lock:
+            for summary in list(self.fast.values()) + list(self.slow.values()):
+                summary.clear()
+            self._fired.clear()
@@ -0,0 +1,204 @@
+"""
+Section-level editing of saved itineraries.
+
+An itinerary's markdown is split into sections (preamble, one per day, then
+the general sections such as accommodations or budget that follow the last
+day). A targeted change is mapped to the sections it affects, only those are
+regenerated with a small focused prompt, and the results are spliced back.
+"""
+import difflib
+import re
+
+DAY_HEADING = re.compile(r'^\s*(?:#{1,6}\s*)?\**\s*Day\s+(\d+)\b', re.IGNORECASE)
+HEADING = re.compile(r'^\s*(?:#{1,6}\s+(?P<md>.+?)|\*\*(?P<bold>[^*]+?)\**)\s*:?\s*$')
+LABEL = re.compile(r'^\s*\*\*(?P<label>[^*]+?)\**\s*:?\s*\**\s*:?')
+
+TIME_OF_DAY = {'morning', 'afternoon', 'evening', 'night'}
+BUDGET_KEYWORDS = ('accommodation', 'hotel', 'stay', 'budget', 'cost', 'price', 'expense')
+INTEREST_KEYWORDS = ('attraction', 'gem', 'activit', 'must')
+FOOD_KEYWORDS = ('food', 'dining', 'restaurant', 'eat')
+
+EDIT_TYPES = ('day', 'budget', 'interests', 'days')
+
+
+def _title(line):
+    """Normalized heading/label title of a line, or None"""
+    match = HEADING.match(line) or LABEL.match(line)
+    if not match:
+        return None
+    title = next(group for group in match.groups() if group)
+    return title.strip().strip(':').strip().lower()
+
+
+def _section(key, title, lines, day=None):
+    return {'key': key, 'title': title, 'day': day, 'text': ''.join(lines)}
+
+
+def split_sections(content: str) -> list:
+    """Split itinerary markdown into preamble, day and general sections"""
+    lines = content.splitlines(keepends=True)
+    day_starts = [(i, int(m.group(1))) for i, line in enumerate(lines) if (m := DAY_HEADING.match(line))]
+    if not day_starts:
+        return _split_general(lines, 0) if lines else []
+
+    sections = []
+    if day_starts[0][0] > 0:
+        sections.append(_section('preamble', 'Introduction', lines[:day_starts[0][0]]))
+
+    # Sub-headings used inside earlier days also belong to the last day
+    day_subtitles = set(TIME_OF_DAY)
+    for (start, _), (end, _) in zip(day_starts, day_starts[1:]):
+        day_subtitles.update(t for t in map(_title, lines[start + 1:end]) if t)
+
+    # General sections start at the first unfamiliar heading after the last
+    # day's final familiar sub-heading
+    last_start = day_starts[-1][0]
+    titles = {i: _title(lines[i]) for i in range(last_start + 1, len(lines))}
+    last_known = max((i for i, title in titles.items() if title in day_subtitles), default=last_start)
+    general_start = next(
+        (i for i, title in titles.items() if i > last_known and title and title not in day_subtitles),
+        len(lines)
+    )
+
+    bounds = [start for start, _ in day_starts] + [general_start]
+    for (start, day), end in zip(day_starts, bounds[1:]):
+        sections.append(_section(f'day-{day}', lines[start].strip().strip('#* '), lines[start:end], day))
+    return sections + _split_general(lines[general_start:], len(sections))
+
+
+def _split_general(lines, offset):
+    sections = []
+    current = []
+    title = 'Overview'
+    for line in lines:
+        heading = _title(line)
+        if heading and current and ''.join(current).strip():
+            sections.append(_section(f'section-{offset + len(sections) + 1}', title, current))
+            current = []
+        if heading and not current:
+            title = line.strip().strip('#* :')
+        current.append(line)
+    if current:
+        sections.append(_section(f'section-{offset + len(sections) + 1}', title, current))
+    return sections
+
+
+def join_sections(sections: list) -> str:
+    return ''.join(section['text'] for section in sections)
+
+
+def _matches(section, keywords, search_body=False):
+    haystack = (section['text'] if search_body else section['title']).lower()
+    return any(keyword in haystack for keyword in keywords)
+
+
+def affected_sections(sections: list, change: dict, itinerary: dict) -> list:
+    """
+    Keys of the sections a change affects. Raises ValueError for changes
+    that cannot be applied to this itinerary.
+    """
+    edit_type = change.get('type')
+    day_sections = [s for s in sections if s['day'] is not None]
+    general = [s for s in sections if s['day'] is None and s['key'] != 'preamble']
+
+    if edit_type == 'day':
+        key = f"day-{change.get('day')}"
+        if not any(s['key'] == key for s in sections):
+            raise ValueError(f"Day {change.get('day')} not found in this itinerary")
+        return [key]
+
+    if edit_type == 'budget':
+        affected = [s for s in general if _matches(s, BUDGET_KEYWORDS)]
+        if not affected:
+            # Prices are listed inside each day instead of a separate section
+            affected = [s for s in day_sections if _matches(s, BUDGET_KEYWORDS, search_body=True)]
+        return [s['key'] for s in affected]
+
+    if edit_type == 'interests':
+        changed = set(change.get('interests') or []) ^ set(itinerary.get('interests') or [])
+        keywords = INTEREST_KEYWORDS
+        if any('food' in interest.lower() for interest in changed):
+            keywords += FOOD_KEYWORDS
+        return [s['key'] for s in day_sections + [s for s in general if _matches(s, keywords)]]
+
+    if edit_type == 'days':
+        # Removing days needs no generation; adding days only generates the new ones
+        return []
+
+    raise ValueError(f"Unsupported edit type; expected one of {', '.join(EDIT_TYPES)}")
+
+
+def describe_change(change: dict, itinerary: dict) -> str:
+    edit_type = change.get('type')
+    instructions = change.get('instructions', '').strip()
+    if edit_type == 'budget':
+        text = f"Change the budget level from {itinerary.get('budget')} to {change.get('budget')}."
+    elif edit_type == 'interests':
+        interests = ', '.join(change.get('interests') or []) or 'general sightseeing'
+        text = f"The traveler's interests are now: {interests}."
+    elif edit_type == 'day':
+        text = f"Revise day {change.get('day')} of the trip."
+    else:
+        text = ''
+    return f"{text} {instructions}".strip()
+
+
+def build_section_prompt(section: dict, change: dict, itinerary: dict) -> str:
+    return f"""You are editing one section of an existing {itinerary.get('days')}-day travel itinerary for {itinerary.get('destination')}.
+
+Budget Level: {change.get('budget') or itinerary.get('budget')}
+Interests: {', '.join(change.get('interests') or itinerary.get('interests') or []) or 'General sightseeing'}
+Requested change: {describe_change(change, itinerary)}
+
+Current section:
+{section['text'].strip()}
+
+Rewrite only this section so it reflects the requested change. Keep the same heading line and the same formatting style. Return only the rewritten section."""
+
+
+def build_new_days_prompt(first_day: int, last_day: int, example: dict, itinerary: dict) -> str:
+    return f"""You are extending an existing travel itinerary for {itinerary.get('destination')} from {first_day - 1} to {last_day} days.
+
+Budget Level: {itinerary.get('budget')}
+Interests: {', '.join(itinerary.get('interests') or []) or 'General sightseeing'}
+
+Here is the last existing day, for reference:
+{example['text'].strip()}
+
+Write days {first_day} to {last_day} only, using exactly the same heading and formatting style. Do not repeat activities from the example day."""
+
+
+def _heading_line(text):
+    lines = text.strip().splitlines()
+    return lines[0] if lines else ''
+
+
+def replace_text(section: dict, new_text: str, keep_heading=True) -> str:
+    """
+    New section text, keeping the original's trailing blank lines. With
+    keep_heading, the original heading line is put back if the model dropped
+    or renumbered it, since the heading is what marks the section boundary.
+    """
+    trailing = section['text'][len(section['text'].rstrip()):]
+    text = new_text.strip()
+    heading = _heading_line(section['text'])
+    if keep_heading and heading:
+        first = _heading_line(text)
+        if section['day'] is not None:
+            match = DAY_HEADING.match(first)
+            if match is None:
+                text = f"{heading}\n{text}"
+            elif int(match.group(1)) != section['day']:
+                text = heading + text[len(first):]
+        elif _title(heading) and not _title(first):
+            text = f"{heading}\n{text}"
+    return text + (trailing or '\n')
+
+
+def text_diff(old: str, new: str) -> str:
+    return ''.join(difflib.unified_diff(
+        old.splitlines(keepends=True),
+        new.splitlines(keepends=True),
+        fromfile='before',
+        tofile='after'
+    ))
@@ -0,0 +1,137 @@
+"""
+Read-only SQLite store of pre-generated itineraries for popular destinations.
+
+The store is filled offline by pregenerate.py and opened read-only by the
+API, so an exact (destination, days, budget, interests) match can be served
+without calling OpenRouter.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+PREGENERATED_DB_FILE = os.getenv(
+    'PREGENERATED_DB_FILE',
+    os.path.join(os.path.dirname(__file__), 'pregenerated.db')
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS itineraries (
+    key TEXT PRIMARY KEY,
+    destination TEXT NOT NULL,
+    days INTEGER NOT NULL,
+    budget TEXT NOT NULL,
+    interests TEXT NOT NULL,
+    itinerary TEXT NOT NULL,
+    image_url TEXT NOT NULL,
+    generated_at REAL NOT NULL
+)
+"""
+
+# One read-only connection per thread; sqlite3 connections are not shareable
+_local = threading.local()
+
+
+def normalize_interests(interests) -> str:
+    """Canonical, order-independent form of an interests list"""
+    return '|'.join(sorted({str(i).strip().lower() for i in interests or [] if str(i).strip()}))
+
+
+def make_key(destination: str, days, budget: str, interests) -> str:
+    """Build the lookup key for a request's parameters"""
+    try:
+        days = int(days)
+    except (TypeError, ValueError):
+        return ''
+    return f"{destination.strip().lower()}:{days}:{str(budget).strip().lower()}:{normalize_interests(interests)}"
+
+
+def _reader():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        if not os.path.exists(PREGENERATED_DB_FILE):
+            return None
+        conn = sqlite3.connect(f"file:{PREGENERATED_DB_FILE}?mode=ro", uri=True, check_same_thread=False)
+        _local.conn = conn
+    return conn
+
+
+def lookup(destination: str, days, budget: str, interests):
+    """
+    Return {'itinerary', 'imageUrl', 'generatedAt'} for an exact match, or None
+    """
+    key = make_key(destination, days, budget, interests)
+    if not key:
+        return None
+    conn = _reader()
+    if conn is None:
+        return None
+    try:
+        row = conn.execute(
+            "SELECT itinerary, image_url, generated_at FROM itineraries WHERE key = ?",
+            (key,)
+        ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Error reading pre-generated store: {e}")
+        return None
+    if row is None:
+        return None
+    return {'itinerary': row[0], 'imageUrl': row[1], 'generatedAt': row[2]}
+
+
+def lookup_closest(destination: str, days, budget: str):
+    """
+    Best available entry for the same destination and trip length, preferring
+    the same budget and then the plan without specific interests. Used as a
+    degraded-mode fallback when generation is unavailable.
+    """
+    conn = _reader()
+    if conn is None:
+        return None
+    try:
+        row = conn.execute(
+            """SELECT itinerary, image_url, generated_at FROM itineraries
+               WHERE destination = ? AND days = ?
+               ORDER BY budget = ? DESC, interests = '' DESC
+               LIMIT 1""",
+            (destination.strip().lower(), int(days), str(budget).strip().lower())
+        ).fetchone()
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        print(f"Error reading pre-generated store: {e}")
+        return None
+    if row is None:
+        return None
+    return {'itinerary': row[0], 'imageUrl': row[1], 'generatedAt': row[2]}
+
+
+def open_writer(path: str = None):
+    """Open the store for writing (used by the pre-generation command only)"""
+    conn = sqlite3.connect(path or PREGENERATED_DB_FILE)
+    # WAL lets running API workers keep reading while a refresh writes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(SCHEMA)
+    return conn
+
+
+def generated_at(conn, key: str):
+    """Timestamp of an existing entry, or None if it is missing"""
+    row = conn.execute("SELECT generated_at FROM itineraries WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def put(conn, destination: str, days: int, budget: str, interests, itinerary: str, image_url: str):
+    """Insert or replace one pre-generated itinerary"""
+    conn.execute(
+        "INSERT OR REPLACE INTO itineraries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            make_key(destination, days, budget, interests),
+            destination.strip().lower(),
+            int(days),
+            budget,
+            normalize_interests(interests),
+            itinerary,
+            image_url,
+            time.time()
+        )
+    )
+    conn.commit()
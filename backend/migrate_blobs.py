@@ -0,0 +1,39 @@
+"""
+Move inline itinerary content from users_db.json into the blob store.
+
+Records saved before the blob store keep their full `content` inline; they
+stay readable, but this rewrites them to hold only a `contentRef`.
+
+Usage:
+    python migrate_blobs.py
+"""
+import blob_store
+from app import load_users_db, save_users_db, store_itinerary_content, users_db_lock
+
+
+def main():
+    # Safe to run while the server is up: saves wait for the lock
+    with users_db_lock():
+        users_db = load_users_db()
+        migrated = []
+        for user in users_db.values():
+            for itinerary in user.get('itineraries', []):
+                if 'content' in itinerary and 'contentRef' not in itinerary:
+                    store_itinerary_content(itinerary)
+                    migrated.append(itinerary['contentRef'])
+
+        if not migrated:
+            print("Nothing to migrate.")
+            return
+        if not save_users_db(users_db):
+            # Undo the references taken above so refcounts stay accurate
+            blob_store.release(migrated)
+            print("❌ Failed to write users database; nothing migrated.")
+            return
+
+    print(f"✅ Migrated {len(migrated)} itineraries")
+    print(blob_store.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Batch pre-generation of itineraries for popular destinations.
+
+Walks destination x days x budget x interests combinations, generates each
+itinerary and image through the same code path as the API, and writes them
+into the read-only store served by /api/generate-itinerary.
+
+Usage:
+    python pregenerate.py                      # fill in missing entries
+    python pregenerate.py --refresh            # also regenerate stale entries
+    python pregenerate.py --cities paris rome --days 3 5 --rate 20
+"""
+import argparse
+import itertools
+import time
+
+import itinerary_store
+from app import (
+    CITY_CONTEXT_MAP,
+    build_itinerary_prompt,
+    call_openrouter,
+    estimate_itinerary_tokens,
+    fetch_location_image
+)
+
+DEFAULT_DAYS = [1, 2, 3, 5, 7]
+DEFAULT_BUDGETS = ['budget', 'moderate', 'luxury']
+
+# No interests plus each single option offered by the itinerary form
+DEFAULT_INTEREST_SETS = [[]] + [[interest] for interest in [
+    'Culture & History',
+    'Food & Dining',
+    'Adventure',
+    'Nature & Wildlife',
+    'Shopping',
+    'Nightlife',
+    'Photography',
+    'Relaxation'
+]]
+
+
+def combinations(cities, days, budgets, interest_sets):
+    return itertools.product(cities, days, budgets, interest_sets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-generate itineraries for popular destinations')
+    parser.add_argument('--cities', nargs='+', default=list(CITY_CONTEXT_MAP.keys()))
+    parser.add_argument('--days', nargs='+', type=int, default=DEFAULT_DAYS)
+    parser.add_argument('--budgets', nargs='+', default=DEFAULT_BUDGETS)
+    parser.add_argument('--no-interests', action='store_true',
+                        help='Only generate entries without interests')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Regenerate entries older than --max-age-days')
+    parser.add_argument('--max-age-days', type=float, default=30)
+    parser.add_argument('--rate', type=float, default=30,
+                        help='Maximum OpenRouter requests per minute')
+    parser.add_argument('--limit', type=int, default=0,
+                        help='Stop after this many generations (0 = no limit)')
+    parser.add_argument('--db', default=itinerary_store.PREGENERATED_DB_FILE)
+    args = parser.parse_args()
+
+    interest_sets = [[]] if args.no_interests else DEFAULT_INTEREST_SETS
+    min_interval = 60.0 / args.rate if args.rate > 0 else 0
+    stale_before = time.time() - args.max_age_days * 86400
+
+    conn = itinerary_store.open_writer(args.db)
+    images = {}
+    generated = skipped = failed = 0
+    last_call = 0.0
+
+    for city, days, budget, interests in combinations(args.cities, args.days, args.budgets, interest_sets):
+        if args.limit and generated >= args.limit:
+            break
+
+        key = itinerary_store.make_key(city, days, budget, interests)
+        existing = itinerary_store.generated_at(conn, key)
+        if existing is not None and (not args.refresh or existing >= stale_before):
+            skipped += 1
+            continue
+
+        # Stay within the requested rate budget
+        wait = min_interval - (time.time() - last_call)
+        if wait > 0:
+            time.sleep(wait)
+        last_call = time.time()
+
+        destination = city.title()
+        try:
+            itinerary = call_openrouter(
+                build_itinerary_prompt(destination, days, budget, interests),
+                max_tokens=estimate_itinerary_tokens(days, interests)
+            )
+            if city not in images:
+                images[city] = fetch_location_image(destination)
+            itinerary_store.put(conn, city, days, budget, interests, itinerary, images[city])
+            generated += 1
+            print(f"✅ {key}")
+        except Exception as e:
+            failed += 1
+            print(f"⚠️ Failed to generate {key}: {str(e)}")
+
+    conn.close()
+    print(f"\nGenerated: {generated}  Skipped: {skipped}  Failed: {failed}")
+
+
+if __name__ == '__main__':
+    main()
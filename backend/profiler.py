@@ -0,0 +1,208 @@
+"""
+On-demand request profiling.
+
+- phase(name) times named sections of a request (JSON file I/O, prompt
+  building, OpenRouter, Unsplash) into the current request's record.
+- A request is stack-sampled when an admin sends "X-Profile: 1" (whether
+  or not profiling is enabled) or, while enabled, when it falls within the
+  configured sample rate. Samples are kept as flamegraph-compatible
+  collapsed stacks.
+- SlowRequestLog keeps the N slowest requests of the recent window.
+
+When profiling is disabled and no admin-requested profile is running, the
+hooks return immediately and phase() only checks two flags.
+"""
+import heapq
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+PROFILER_SLOW_REQUESTS = int(os.getenv('PROFILER_SLOW_REQUESTS', 20))
+PROFILER_WINDOW_SECONDS = int(os.getenv('PROFILER_WINDOW_SECONDS', 3600))
+PROFILER_SAMPLE_INTERVAL = float(os.getenv('PROFILER_SAMPLE_INTERVAL', 0.005))
+
+settings = {
+    'enabled': os.getenv('PROFILER_ENABLED', 'False') == 'True',
+    'sample_rate': float(os.getenv('PROFILER_SAMPLE_RATE', 0.0))
+}
+
+
+class SlowRequestLog:
+    """Bounded min-heap of the slowest requests seen within the window"""
+
+    def __init__(self, size, window_seconds):
+        self.size = size
+        self.window_seconds = window_seconds
+        self._heap = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        cutoff = time.time() - self.window_seconds
+        if any(entry[2]['timestamp'] < cutoff for entry in self._heap):
+            self._heap = [entry for entry in self._heap if entry[2]['timestamp'] >= cutoff]
+            heapq.heapify(self._heap)
+
+    def add(self, record):
+        with self._lock:
+            self._expire()
+            record['id'] = next(self._ids)
+            entry = (record['duration_ms'], record['id'], record)
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif entry[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def records(self):
+        """Slowest first"""
+        with self._lock:
+            self._expire()
+            return [entry[2] for entry in sorted(self._heap, reverse=True)]
+
+    def get(self, record_id):
+        for record in self.records():
+            if record['id'] == record_id:
+                return record
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
+
+
+slow_requests = SlowRequestLog(PROFILER_SLOW_REQUESTS, PROFILER_WINDOW_SECONDS)
+
+
+class StackSampler:
+    """
+    Background thread that samples the Python stacks of registered threads
+    (the ones serving profiled requests) into collapsed-stack counters.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id):
+        counter = Counter()
+        with self._lock:
+            self._targets[thread_id] = counter
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return counter
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._targets.pop(thread_id, None)
+
+    @property
+    def active(self):
+        """True while any request is being sampled"""
+        return bool(self._targets)
+
+    def _run(self):
+        while True:
+            frames = sys._current_frames()
+            with self._lock:
+                # Counters are only touched under the lock, so stop() hands back a stable copy
+                for thread_id, counter in self._targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counter[_collapse(frame)] += 1
+                idle = not self._targets
+                if idle:
+                    self._wake.clear()
+            del frames
+            if idle:
+                self._wake.wait()
+            else:
+                time.sleep(self.interval)
+
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+sampler = StackSampler(PROFILER_SAMPLE_INTERVAL)
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block to the current request's phase breakdown"""
+    if not (settings['enabled'] or sampler.active) or not has_request_context() or 'profile' not in g:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases = g.profile['phases']
+        phases[name] = phases.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def collapsed_stacks(records):
+    """Merge the samples of the given records into collapsed-stack text"""
+    merged = Counter()
+    for record in records:
+        merged.update(record.get('stacks') or {})
+    return '\n'.join(f"{stack} {count}" for stack, count in merged.most_common())
+
+
+def init_app(app, is_admin_request):
+    """Register the profiling hooks on the Flask app"""
+
+    @app.before_request
+    def _start_profile():
+        # An admin's X-Profile header profiles that request even when profiling is off
+        wants_profile = request.headers.get('X-Profile') == '1' and is_admin_request()
+        if not settings['enabled'] and not wants_profile:
+            return
+        g.profile = {'start': time.perf_counter(), 'phases': {}, 'sampled': False}
+        if wants_profile or (settings['sample_rate'] and random.random() < settings['sample_rate']):
+            g.profile['sampled'] = True
+            sampler.start(threading.get_ident())
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        stacks = sampler.stop(threading.get_ident()) if profile['sampled'] else None
+        duration_ms = (time.perf_counter() - profile['start']) * 1000
+        slow_requests.add({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'timestamp': time.time(),
+            'duration_ms': round(duration_ms, 2),
+            'phases': {name: round(ms, 2) for name, ms in profile['phases'].items()},
+            'stacks': dict(stacks) if stacks else None
+        })
+        response.headers['Server-Timing'] = ', '.join(
+            [f"{name};dur={ms:.1f}" for name, ms in profile['phases'].items()] + [f"total;dur={duration_ms:.1f}"]
+        )
+        return response
+
+    @app.teardown_request
+    def _abort_profile(exc):
+        # after_request is skipped when a request raises; stop sampling anyway
+        profile = g.pop('profile', None)
+        if profile is not None and profile['sampled']:
+            sampler.stop(threading.get_ident())
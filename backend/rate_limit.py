@@ -0,0 +1,223 @@
+"""
+Inbound rate limiting for the generation endpoints.
+
+Two layers, applied by the @rate_limited decorator:
+
+- SlidingWindowLimiter: per-client request budget per window, using the
+  sliding-window-counter approximation (previous window weighted by overlap
+  plus current window). Counters live in a small SQLite file so all gunicorn
+  workers on the host share them.
+- FairShareQueue: caps concurrent upstream work per process and hands free
+  slots to waiting clients round-robin, so one client's burst cannot starve
+  the others. A client with too many requests already waiting is rejected.
+  The queue is per worker, so its slots default to the worker's thread
+  count minus a reserve; with more slots than threads nobody would ever
+  wait and the round-robin would never run.
+
+Over-limit requests get a cheap 429 with Retry-After. The email in the
+request body is not verified, so every request is limited by IP address
+(as resolved by ProxyFix from the trusted proxy's X-Forwarded-For entry)
+and, when an email is given, by that email too; making up a new email
+does not buy a fresh budget. The fair-share queue is keyed by IP.
+"""
+import math
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import wraps
+
+from flask import jsonify, request
+
+RATE_LIMIT_DB_FILE = os.getenv(
+    'RATE_LIMIT_DB_FILE',
+    os.path.join(tempfile.gettempdir(), 'travel_itinerary_rate_limits.db')
+)
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True') == 'True'
+RATE_LIMIT_WINDOW_SECONDS = int(os.getenv('RATE_LIMIT_WINDOW_SECONDS', 60))
+# Threads per gunicorn worker (same variable and default as gunicorn.conf.py)
+WORKER_THREADS = int(os.getenv('GUNICORN_THREADS', 8))
+# Threads kept free of generation work for waiting clients and cheap endpoints
+GENERATION_RESERVED_THREADS = int(os.getenv('GENERATION_RESERVED_THREADS', WORKER_THREADS // 2))
+GENERATION_SLOTS = int(os.getenv('GENERATION_SLOTS', max(1, WORKER_THREADS - GENERATION_RESERVED_THREADS)))
+MAX_WAITING_PER_CLIENT = int(os.getenv('MAX_WAITING_PER_CLIENT', 2))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv('QUEUE_TIMEOUT_SECONDS', 15))
+
+
+class SlidingWindowLimiter:
+    def __init__(self, path, window_seconds):
+        self.path = path
+        self.window_seconds = window_seconds
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None, check_same_thread=False)
+            # Counters are disposable, so trade durability for speed
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                "key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL, "
+                "PRIMARY KEY (key, window)) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, limit):
+        """
+        Count one request for key. Returns 0 if allowed, otherwise the
+        number of seconds to wait before retrying.
+        """
+        now = time.time()
+        window = int(now // self.window_seconds)
+        elapsed = now - window * self.window_seconds
+        overlap = 1 - elapsed / self.window_seconds
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = dict(conn.execute(
+                "SELECT window, count FROM counters WHERE key = ? AND window IN (?, ?)",
+                (key, window - 1, window)
+            ).fetchall())
+            previous, current = rows.get(window - 1, 0), rows.get(window, 0)
+            if previous * overlap + current >= limit:
+                conn.execute("ROLLBACK")
+                if current >= limit or not previous:
+                    return max(1, math.ceil(self.window_seconds - elapsed))
+                # Wait until enough of the previous window has slid out
+                needed = (previous * overlap + current - limit + 1) / previous * self.window_seconds
+                return max(1, math.ceil(min(needed, self.window_seconds - elapsed)))
+            conn.execute(
+                "INSERT INTO counters VALUES (?, ?, 1) "
+                "ON CONFLICT (key, window) DO UPDATE SET count = count + 1",
+                (key, window)
+            )
+            # Occasionally drop windows that can no longer matter
+            if random.random() < 0.01:
+                conn.execute("DELETE FROM counters WHERE window < ?", (window - 1,))
+            conn.execute("COMMIT")
+            return 0
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+
+class FairShareQueue:
+    def __init__(self, slots, max_waiting_per_client, timeout):
+        self.max_waiting_per_client = max_waiting_per_client
+        self.timeout = timeout
+        self._free = slots
+        self._cond = threading.Condition()
+        # client -> waiting tickets; order of clients is the round-robin order
+        self._waiting = OrderedDict()
+
+    def _next_ticket(self):
+        for tickets in self._waiting.values():
+            if tickets:
+                return tickets[0]
+        return None
+
+    def _remove(self, client, ticket):
+        tickets = self._waiting[client]
+        tickets.remove(ticket)
+        if not tickets:
+            del self._waiting[client]
+        else:
+            self._waiting.move_to_end(client)
+
+    def acquire(self, client) -> bool:
+        with self._cond:
+            tickets = self._waiting.setdefault(client, deque())
+            if len(tickets) >= self.max_waiting_per_client:
+                return False
+            ticket = object()
+            tickets.append(ticket)
+            deadline = time.monotonic() + self.timeout
+            while not (self._free > 0 and self._next_ticket() is ticket):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._remove(client, ticket)
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+            self._free -= 1
+            self._remove(client, ticket)
+            self._cond.notify_all()
+            return True
+
+    def release(self):
+        with self._cond:
+            self._free += 1
+            self._cond.notify_all()
+
+
+limiter = SlidingWindowLimiter(RATE_LIMIT_DB_FILE, RATE_LIMIT_WINDOW_SECONDS)
+generation_queue = FairShareQueue(GENERATION_SLOTS, MAX_WAITING_PER_CLIENT, QUEUE_TIMEOUT_SECONDS)
+
+
+def client_ip_key():
+    # remote_addr is already rewritten by ProxyFix; raw X-Forwarded-For is client-controlled
+    return f"ip:{request.remote_addr}"
+
+
+def client_key():
+    """Email from the JSON body if given, otherwise the client IP"""
+    data = request.get_json(silent=True) or {}
+    email = str(data.get('email') or '').strip().lower()
+    if email:
+        return f"email:{email}"
+    return client_ip_key()
+
+
+def client_keys():
+    """Every key a request is limited under: always the IP, plus the claimed email"""
+    ip_key, key = client_ip_key(), client_key()
+    return [ip_key] if key == ip_key else [ip_key, key]
+
+
+def too_many_requests(retry_after, details):
+    return jsonify({
+        'error': 'Too many requests',
+        'details': details
+    }), 429, {'Retry-After': str(int(retry_after))}
+
+
+def rate_limited(scope, limit):
+    """
+    Limit a view to `limit` requests per window per client and run it
+    through the fair-share generation queue
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not RATE_LIMIT_ENABLED:
+                return view(*args, **kwargs)
+            try:
+                retry_after = 0
+                for key in client_keys():
+                    retry_after = limiter.hit(f"{scope}:{key}", limit)
+                    if retry_after:
+                        break
+            except sqlite3.Error as e:
+                # Fail open: a broken limiter must not take the API down
+                print(f"Rate limiter error: {e}")
+                retry_after = 0
+            if retry_after:
+                return too_many_requests(
+                    retry_after, f"Limit is {limit} requests per {RATE_LIMIT_WINDOW_SECONDS} seconds"
+                )
+            if not generation_queue.acquire(client_ip_key()):
+                return too_many_requests(1, 'Too many requests in progress, please retry shortly')
+            try:
+                return view(*args, **kwargs)
+            finally:
+                generation_queue.release()
+        return wrapper
+    return decorator
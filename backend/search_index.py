@@ -0,0 +1,180 @@
+"""
+Full-text search over saved itineraries.
+
+Each itinerary is indexed paragraph by paragraph in an SQLite FTS5 table,
+which is an incrementally maintained inverted index ranked with BM25.
+save_itinerary/delete_itinerary keep it in sync, so searches never load
+users_db.json. The index file is shared by all workers on the host and is
+rebuilt from the users database if it is missing or was built with a
+different tokenizer.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+SEARCH_INDEX_FILE = os.getenv(
+    'SEARCH_INDEX_FILE',
+    os.path.join(os.path.dirname(__file__), 'search_index.db')
+)
+# Porter stemming lets "hiking" match "hike"; changing this triggers a rebuild
+SEARCH_STEMMING = os.getenv('SEARCH_STEMMING', 'True') == 'True'
+TOKENIZER = 'porter unicode61 remove_diacritics 2' if SEARCH_STEMMING else 'unicode61 remove_diacritics 2'
+
+QUERY_TOKEN = re.compile(r'\w+', re.UNICODE)
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_load_users_db = None
+
+
+def init(load_users_db):
+    """Set the loader used to (re)build the index from the users database"""
+    global _load_users_db
+    _load_users_db = load_users_db
+
+
+def _connect():
+    conn = sqlite3.connect(SEARCH_INDEX_FILE, timeout=5, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _conn():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        return conn
+    with _init_lock:
+        conn = _connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = conn.execute("SELECT value FROM meta WHERE key = 'tokenizer'").fetchone()
+        if row is None or row[0] != TOKENIZER:
+            rebuild(conn, _load_users_db() if _load_users_db else {})
+    _local.conn = conn
+    return conn
+
+
+def rebuild(conn, users_db):
+    """Recreate the index from a users database"""
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS paragraphs")
+        conn.execute("DROP TABLE IF EXISTS documents")
+        conn.execute(
+            "CREATE VIRTUAL TABLE paragraphs USING fts5("
+            f"destination, body, owner, tokenize = '{TOKENIZER}')"
+        )
+        # Maps FTS rowids back to their itinerary; indexed for cheap deletes
+        conn.execute(
+            "CREATE TABLE documents (id INTEGER PRIMARY KEY, email TEXT NOT NULL, itinerary_id TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX documents_itinerary ON documents (email, itinerary_id)")
+        for email, user in users_db.items():
+            for itinerary in user.get('itineraries', []):
+                _insert(conn, email, itinerary)
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('tokenizer', ?)", (TOKENIZER,))
+
+
+def owner_token(email):
+    """
+    Single indexed token per user, so per-user searches intersect posting
+    lists instead of filtering every match
+    """
+    return 'u' + hashlib.sha1(email.encode()).hexdigest()[:16]
+
+
+def _paragraphs(content):
+    return [p.strip() for p in PARAGRAPH_BREAK.split(content or '') if p.strip()]
+
+
+def _insert(conn, email, itinerary):
+    destination = itinerary.get('destination', '')
+    owner = owner_token(email)
+    for paragraph in _paragraphs(itinerary.get('content')):
+        rowid = conn.execute(
+            "INSERT INTO documents (email, itinerary_id) VALUES (?, ?)",
+            (email, str(itinerary.get('id')))
+        ).lastrowid
+        conn.execute(
+            "INSERT INTO paragraphs (rowid, destination, body, owner) VALUES (?, ?, ?, ?)",
+            (rowid, destination, paragraph, owner)
+        )
+
+
+def _delete(conn, email, itinerary_id):
+    params = (email, str(itinerary_id))
+    conn.execute(
+        "DELETE FROM paragraphs WHERE rowid IN "
+        "(SELECT id FROM documents WHERE email = ? AND itinerary_id = ?)",
+        params
+    )
+    conn.execute("DELETE FROM documents WHERE email = ? AND itinerary_id = ?", params)
+
+
+def index_itinerary(email, itinerary):
+    """Add (or replace) one itinerary in the index"""
+    conn = _conn()
+    with conn:
+        _delete(conn, email, itinerary.get('id'))
+        _insert(conn, email, itinerary)
+
+
+def remove_itineraries(email, itinerary_ids):
+    """Drop itineraries from the index"""
+    if not itinerary_ids:
+        return
+    conn = _conn()
+    with conn:
+        for itinerary_id in itinerary_ids:
+            _delete(conn, email, itinerary_id)
+
+
+def build_query(text):
+    """
+    Turn free text into an FTS5 query: every word is quoted (so user input
+    cannot inject query syntax) and terms are OR-ed so BM25 ranks
+    paragraphs matching more of them higher
+    """
+    terms = QUERY_TOKEN.findall(text.lower())
+    return ' OR '.join(f'"{term}"' for term in dict.fromkeys(terms))
+
+
+def search(text, email=None, limit=10):
+    """
+    Best-matching itineraries, one hit per itinerary with its best
+    paragraph as a snippet. Searches all users when email is None.
+    """
+    query = build_query(text)
+    if not query:
+        return []
+    if email is not None:
+        query = f'owner : "{owner_token(email)}" AND ({query})'
+    conn = _conn()
+    # Several paragraphs of one itinerary can match; over-fetch, then keep the best
+    sql = (
+        "SELECT documents.email, documents.itinerary_id, paragraphs.destination, "
+        "snippet(paragraphs, 1, '**', '**', '…', 24), bm25(paragraphs, 2.0, 1.0, 0.0) AS score "
+        "FROM paragraphs JOIN documents ON documents.id = paragraphs.rowid "
+        "WHERE paragraphs MATCH ? ORDER BY score LIMIT ?"
+    )
+    params = [query, limit * 5]
+
+    results = []
+    seen = set()
+    for row_email, itinerary_id, destination, snippet, score in conn.execute(sql, params):
+        if (row_email, itinerary_id) in seen:
+            continue
+        seen.add((row_email, itinerary_id))
+        results.append({
+            'email': row_email,
+            'itineraryId': itinerary_id,
+            'destination': destination,
+            'snippet': snippet,
+            # FTS5 bm25() is negative; flip it so higher is better
+            'score': round(-score, 4)
+        })
+        if len(results) >= limit:
+            break
+    return results
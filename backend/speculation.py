@@ -0,0 +1,93 @@
+"""
+Short-lived cache of speculative itinerary generations.
+
+/api/prefetch starts generating the most likely plan while the user is
+still filling in the form; /api/generate-itinerary then takes the result
+(or waits on the in-flight generation) when the submitted parameters
+match. A speculation still queued behind others is cancelled instead,
+since generating directly is quicker than waiting for a worker. Entries that nobody claims expire after a few minutes and count as
+wasted speculation in the stats.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+
+class SpeculativeCache:
+    def __init__(self, ttl, max_entries, workers):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='speculate')
+        self._entries = {}  # key -> (future, expires at)
+        self._lock = threading.Lock()
+        self.stats = {
+            'started': 0, 'hits': 0, 'misses': 0, 'wasted': 0, 'failed': 0, 'capped': 0, 'deduplicated': 0,
+            'queued': 0, 'timeouts': 0
+        }
+
+    def _expire(self, now):
+        for key in [k for k, (_, expires) in self._entries.items() if expires <= now]:
+            future, _ = self._entries.pop(key)
+            self.stats['wasted'] += 1
+            future.cancel()
+
+    def has(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def start(self, key, fn, *args):
+        """
+        Run fn(*args) in the background under key unless it is already
+        cached or in flight. Returns False if the cache is full.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key in self._entries:
+                self.stats['deduplicated'] += 1
+                return True
+            if len(self._entries) >= self.max_entries:
+                return False
+            self._entries[key] = (self._executor.submit(fn, *args), now + self.ttl)
+            self.stats['started'] += 1
+            return True
+
+    def take(self, key, timeout):
+        """
+        Claim the result for key, waiting up to timeout for a running
+        generation. Returns None on a miss, if the speculation had not
+        started yet (it is cancelled), timed out or failed.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or entry[1] <= time.monotonic():
+            self.stats['wasted' if entry else 'misses'] += 1
+            return None
+        future = entry[0]
+        # Only succeeds while the speculation is still waiting for a worker
+        if future.cancel():
+            self.stats['queued'] += 1
+            return None
+        try:
+            result = future.result(timeout=timeout)
+        except TimeoutError:
+            self.stats['timeouts'] += 1
+            return None
+        except Exception as e:
+            print(f"Speculative generation failed: {e}")
+            self.stats['failed'] += 1
+            return None
+        self.stats['hits'] += 1
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            pending = len(self._entries)
+        started = self.stats['started']
+        return dict(
+            self.stats,
+            pending=pending,
+            hitRate=round(self.stats['hits'] / started, 3) if started else None
+        )
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import sqlite3
+import threading
+
+import pytest
+
+import blob_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, 'BLOB_STORE_FILE', str(tmp_path / 'blobs.db'))
+    monkeypatch.setattr(blob_store, '_local', threading.local())
+    return blob_store
+
+
+def refcounts(store):
+    return dict(store._conn().execute("SELECT hash, refcount FROM blobs"))
+
+
+def test_put_deduplicates_and_counts_references(store):
+    first = store.put('Day 1\nBeach')
+    assert store.put('Day 1\nBeach') == first == store.content_hash('Day 1\nBeach')
+    other = store.put('Day 1\nMuseum')
+    assert refcounts(store) == {first: 2, other: 1}
+    assert store.get_many([first, other, None, 'missing']) == {first: 'Day 1\nBeach', other: 'Day 1\nMuseum'}
+    assert store.stats()['blobs'] == 2
+    assert store.stats()['references'] == 3
+
+
+def test_release_deletes_blob_at_zero_references(store):
+    digest = store.put('shared')
+    store.put('shared')
+    store.release([digest])
+    assert refcounts(store) == {digest: 1}
+    store.release([digest, None, ''])
+    assert refcounts(store) == {}
+    assert store.get_many([digest]) == {}
+    # Storing it again starts a fresh count
+    store.put('shared')
+    assert refcounts(store) == {digest: 1}
+
+
+def test_put_many_adds_all_references_or_none(store, monkeypatch):
+    digests = store.put_many(['a', 'b', 'a'])
+    assert refcounts(store) == {store.content_hash('a'): 2, store.content_hash('b'): 1}
+    assert digests == [store.content_hash(t) for t in ('a', 'b', 'a')]
+
+    real_compress = store._compress
+
+    def failing_compress(raw, codec):
+        if raw == b'c':
+            raise sqlite3.OperationalError('disk I/O error')
+        return real_compress(raw, codec)
+
+    monkeypatch.setattr(store, '_compress', failing_compress)
+    with pytest.raises(sqlite3.OperationalError):
+        store.put_many(['a', 'b', 'c'])
+    # The references added for 'a' and 'b' before the failure were rolled back
+    assert refcounts(store) == {store.content_hash('a'): 2, store.content_hash('b'): 1}
+
+
+def test_profile_responses_include_itinerary_content(isolated_app):
+    with isolated_app.app.test_client() as client:
+        client.post('/api/user/save-itinerary', json={
+            'email': 'a@example.com', 'id': 'trip-1', 'destination': 'Lagos', 'content': 'Day 1\nBeach'
+        })
+        isolated_app.otp_storage['a@example.com'] = '123456'
+        verified = client.post('/api/auth/verify-code', json={'email': 'a@example.com', 'code': '123456'})
+        updated = client.post('/api/user/update-profile', json={'email': 'a@example.com', 'name': 'Ada'})
+    for user in (verified.get_json()['user'], updated.get_json()['profile']):
+        [itinerary] = user['itineraries']
+        assert itinerary['content'] == 'Day 1\nBeach'
+        assert 'contentRef' not in itinerary
+    # The stored record still only holds the reference
+    [record] = isolated_app.load_users_db()['a@example.com']['itineraries']
+    assert record['contentRef'] == blob_store.content_hash('Day 1\nBeach')
+    assert 'content' not in record
+
+
+def test_refcounts_match_saved_records(isolated_app):
+    with isolated_app.app.test_client() as client:
+        # 22 saves with repeated bodies; the oldest two fall off the 20-itinerary cap
+        for i in range(22):
+            client.post('/api/user/save-itinerary', json={
+                'email': 'a@example.com', 'id': f'trip-{i}', 'destination': 'Lagos', 'content': f'Plan {i % 3}'
+            })
+        client.post('/api/user/delete-itinerary', json={'email': 'a@example.com', 'itineraryId': 'trip-21'})
+    records = isolated_app.load_users_db()['a@example.com']['itineraries']
+    assert len(records) == 19
+    expected = {}
+    for record in records:
+        expected[record['contentRef']] = expected.get(record['contentRef'], 0) + 1
+    assert refcounts(blob_store) == expected
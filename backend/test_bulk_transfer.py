@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import json
+
+import pytest
+
+import bulk_transfer
+
+USERS = {
+    'a@example.com': {'name': 'Ada', 'itineraries': [{'id': 1, 'content': 'Day 1\n"quoted" \\ text'}]},
+    'b@example.com': {'name': 'Bé ✈', 'credits': 1234567890, 'premium': False, 'avatar': None},
+    'c@example.com': {'name': 'Cy', 'score': -12.5e3, 'tags': [[], {}, ['x', {'y': [1, 2]}]]},
+}
+
+
+def write_db(tmp_path, text):
+    path = tmp_path / 'users_db.json'
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_iter_users_values_spanning_chunks(tmp_path, monkeypatch, chunk_size, indent):
+    monkeypatch.setattr(bulk_transfer, 'CHUNK_SIZE', chunk_size)
+    path = write_db(tmp_path, json.dumps(USERS, indent=indent, ensure_ascii=False))
+    assert list(bulk_transfer.iter_users(path)) == list(USERS.items())
+
+
+def test_iter_users_number_at_end_of_document(tmp_path, monkeypatch):
+    # The last value is a bare number, so only EOF tells the parser it is complete
+    monkeypatch.setattr(bulk_transfer, 'CHUNK_SIZE', 3)
+    path = write_db(tmp_path, '{"a@example.com": 123456789}')
+    assert list(bulk_transfer.iter_users(path)) == [('a@example.com', 123456789)]
+
+
+def test_iter_users_empty_and_missing(tmp_path):
+    assert list(bulk_transfer.iter_users(write_db(tmp_path, ' {\n} '))) == []
+    assert list(bulk_transfer.iter_users(str(tmp_path / 'missing.json'))) == []
+
+
+@pytest.mark.parametrize('text', ['', '[]', '{"a@example.com": {"name": "A"}', '{"a@example.com": {"name": '])
+def test_iter_users_rejects_bad_documents(tmp_path, monkeypatch, text):
+    monkeypatch.setattr(bulk_transfer, 'CHUNK_SIZE', 4)
+    with pytest.raises(ValueError):
+        list(bulk_transfer.iter_users(write_db(tmp_path, text)))
+
+
+def test_import_job_rejects_different_body_on_resume(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_transfer, 'STAGING_DIR', str(tmp_path))
+    lines = [json.dumps({'type': 'user', 'email': f'u{i}@example.com', 'name': str(i)}) for i in range(3)]
+    assert bulk_transfer.ImportJob('resume').stage(lines) == (3, 0)
+    # Same body again: everything is already staged
+    assert bulk_transfer.ImportJob('resume').stage(lines) == (0, 0)
+    with pytest.raises(bulk_transfer.ImportMismatch):
+        bulk_transfer.ImportJob('resume').stage(lines[:1] + lines[2:] + lines[1:2])
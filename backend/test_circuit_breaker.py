@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+from types import SimpleNamespace
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, UpstreamUnavailable
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(circuit_breaker, 'time', SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def make_breaker():
+    return CircuitBreaker('upstream', failure_rate=0.5, slow_call_seconds=2.0,
+                          window_size=4, min_calls=4, open_seconds=30.0)
+
+
+def test_opens_once_failure_rate_reached_over_min_calls(clock):
+    breaker = make_breaker()
+    for success in (True, False, True):
+        assert breaker.allow()
+        breaker.record(success, 0.1)
+    # Under min_calls the breaker stays closed whatever the rate
+    assert breaker.state == CLOSED
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(True, 2.5)
+    assert breaker.state == OPEN
+
+
+def test_rejects_while_open_then_lets_one_trial_through(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    assert not breaker.allow()
+    clock.value += 10
+    assert breaker.retry_after() == 21
+    with pytest.raises(UpstreamUnavailable) as error:
+        breaker.call(lambda: 'never called')
+    assert error.value.retry_after == 21
+
+    clock.value += 20
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one trial at a time
+    assert not breaker.allow()
+    assert breaker.snapshot()['rejected'] == 3
+
+
+def test_trial_success_closes_and_failure_reopens(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+
+    clock.value += 30
+    with pytest.raises(RuntimeError):
+        breaker.call(lambda: (_ for _ in ()).throw(RuntimeError('down')))
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.value += 30
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['recentCalls'] == 0
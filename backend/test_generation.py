@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import pytest
+
+import app as app_module
+from app import (ANSWER_MAX_TOKENS, ITINERARY_MAX_TOKENS, MIN_COMPLETION_TOKENS, OPENROUTER_CALL_MAX_TOKENS,
+                 call_openrouter, estimate_answer_tokens, estimate_itinerary_tokens, estimate_section_tokens)
+
+
+def test_itinerary_budget_grows_with_trip_and_is_bounded():
+    three_days = estimate_itinerary_tokens(3)
+    assert estimate_itinerary_tokens(5) > three_days
+    assert estimate_itinerary_tokens(3, ['food', 'art']) > three_days
+    assert estimate_itinerary_tokens(3, [], 'x' * 400) > three_days
+    assert estimate_itinerary_tokens(60, ['food'] * 20, 'x' * 10000) == ITINERARY_MAX_TOKENS
+    # Bad or missing day counts fall back to a 3-day budget
+    assert estimate_itinerary_tokens('abc') == estimate_itinerary_tokens(None) == three_days
+    assert estimate_itinerary_tokens(-4) == estimate_itinerary_tokens(1)
+
+
+def test_answer_and_section_budgets_are_bounded():
+    assert MIN_COMPLETION_TOKENS <= estimate_answer_tokens('') < estimate_answer_tokens('x' * 200)
+    assert estimate_answer_tokens('why? ' * 1000) == ANSWER_MAX_TOKENS
+    assert estimate_section_tokens('') == MIN_COMPLETION_TOKENS
+    section = 'x' * 2000
+    assert estimate_section_tokens(section, 2) > estimate_section_tokens(section)
+    assert estimate_section_tokens(section * 100) == ITINERARY_MAX_TOKENS
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Scripted _post_openrouter: pops (content, finish_reason) replies and records each call"""
+    calls = []
+    replies = []
+
+    def post(messages, max_tokens):
+        calls.append((messages, max_tokens))
+        content, finish_reason = replies.pop(0)
+        return {'content': content, 'finish_reason': finish_reason, 'usage': {}}
+
+    monkeypatch.setattr(app_module, '_post_openrouter', post)
+    monkeypatch.setattr(app_module, 'MAX_CONTINUATIONS', 2)
+    return replies, calls
+
+
+def test_complete_reply_needs_one_call(upstream):
+    replies, calls = upstream
+    replies.append(('Day 1', 'stop'))
+    assert call_openrouter('plan', max_tokens=500) == 'Day 1'
+    assert [max_tokens for _, max_tokens in calls] == [500]
+
+
+def test_truncated_reply_is_continued_and_appended(upstream):
+    replies, calls = upstream
+    before = app_module.get_generation_stats()
+    replies.extend([('Day 1 ... Day', 'length'), (' 2 ...', 'stop')])
+    assert call_openrouter('plan', max_tokens=1000) == 'Day 1 ... Day 2 ...'
+    continuation = calls[1][0]
+    assert continuation[-2] == {'role': 'assistant', 'content': 'Day 1 ... Day'}
+    assert continuation[-1]['content'] == app_module.CONTINUATION_PROMPT
+    assert calls[1][1] == 500
+    after = app_module.get_generation_stats()
+    assert after['retries_saved'] - before['retries_saved'] == 1
+
+
+def test_gives_up_after_max_continuations(upstream):
+    replies, calls = upstream
+    replies.extend([('a', 'length'), ('b', 'length'), ('c', 'length'), ('unused', 'stop')])
+    assert call_openrouter('plan', max_tokens=1000) == 'abc'
+    assert len(calls) == 3
+
+
+def test_large_budgets_are_split_across_calls(upstream):
+    replies, calls = upstream
+    replies.extend([('first', 'length'), (' second', 'stop')])
+    assert call_openrouter('plan', max_tokens=ITINERARY_MAX_TOKENS) == 'first second'
+    assert all(max_tokens <= OPENROUTER_CALL_MAX_TOKENS for _, max_tokens in calls)
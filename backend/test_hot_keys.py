@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+from types import SimpleNamespace
+
+import pytest
+
+from hot_keys import HotKeyTracker, SpaceSaving
+
+
+@pytest.fixture
+def clock():
+    now = SimpleNamespace(value=0.0)
+    return now, lambda: now.value
+
+
+def test_heavy_hitters_survive_in_fixed_memory(clock):
+    _, read = clock
+    summary = SpaceSaving(capacity=3, half_life=1e9, clock=read)
+    for i in range(200):
+        summary.add('lagos')
+        summary.add('paris' if i % 2 else 'rome')
+        summary.add(f'rare-{i}')
+    assert len(summary.counters) == 3
+    top = summary.top(2)
+    assert top[0][0] == 'lagos'
+    assert top[0][1] >= 200
+    # The estimate overshoots the true count by at most the recorded error
+    assert top[0][1] - top[0][2] <= 200
+
+
+def test_counts_decay_with_half_life(clock):
+    now, read = clock
+    summary = SpaceSaving(capacity=10, half_life=60, clock=read)
+    for _ in range(8):
+        summary.add('abuja')
+    now.value = 60
+    assert summary.estimate('abuja') == pytest.approx(4)
+    now.value = 180
+    assert summary.estimate('abuja') == pytest.approx(1)
+    # Fresh hits outrank an older, larger total
+    for _ in range(2):
+        summary.add('accra')
+    assert [key for key, _, _ in summary.top(2)] == ['accra', 'abuja']
+
+
+def test_rescaling_keeps_estimates(clock):
+    now, read = clock
+    summary = SpaceSaving(capacity=10, half_life=1, clock=read)
+    summary.add('kigali')
+    # Far enough ahead that the forward-decay weight would overflow without rescaling
+    now.value = 1000
+    summary.add('kigali')
+    assert summary.estimate('kigali') == pytest.approx(1)
+
+
+def test_tracker_fires_once_per_cooldown(clock):
+    now, read = clock
+    fired = []
+    tracker = HotKeyTracker(['destinations'], hot_threshold=3, cooldown=100,
+                            on_hot=lambda dimension, key: fired.append(key), clock=read)
+    for _ in range(5):
+        tracker.record('destinations', 'nairobi')
+    assert fired == ['nairobi']
+    now.value = 101
+    tracker.record('destinations', 'nairobi')
+    assert fired == ['nairobi', 'nairobi']
+    assert tracker.top('destinations', 1)[0][0] == 'nairobi'
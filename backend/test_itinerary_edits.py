@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import json
+import os
+
+import pytest
+
+from itinerary_edits import join_sections, replace_text, split_sections
+
+with open(os.path.join(os.path.dirname(__file__), 'users_db.json')) as f:
+    SAMPLE_ITINERARIES = [
+        it for user in json.load(f).values() for it in user.get('itineraries', []) if it.get('content')
+    ]
+
+
+def sample(destination):
+    return next(it for it in SAMPLE_ITINERARIES if it['destination'] == destination)
+
+
+@pytest.mark.parametrize('itinerary', SAMPLE_ITINERARIES, ids=lambda it: it['destination'])
+def test_split_sample_itineraries_round_trips(itinerary):
+    sections = split_sections(itinerary['content'])
+    assert join_sections(sections) == itinerary['content']
+    days = [section['day'] for section in sections if section['day'] is not None]
+    assert days == list(range(1, len(days) + 1))
+    assert len({section['key'] for section in sections}) == len(sections)
+
+
+def test_split_day_then_general_sections():
+    sections = split_sections(sample('Abuja')['content'])
+    assert [s['key'] for s in sections[:5]] == ['day-1', 'day-2', 'day-3', 'day-4', 'section-5']
+    assert sections[0]['title'] == 'Day 1: Arrival in Abuja'
+    assert sections[4]['title'] == 'Accommodations'
+    # Morning/afternoon sub-headings of the last day stay inside it
+    assert 'Evening' in sections[3]['text']
+    assert 'Accommodations' not in sections[3]['text']
+
+
+def test_split_without_day_headings():
+    sections = split_sections(sample('Paris, France')['content'])
+    assert [(s['key'], s['title']) for s in sections] == [('section-1', 'Overview')]
+    assert split_sections('') == []
+
+
+def test_replace_text_keeps_or_restores_heading():
+    day = split_sections(sample('Abuja')['content'])[1]
+    heading = day['text'].splitlines()[0]
+    assert replace_text(day, 'Visit the museum.').startswith(heading + '\nVisit the museum.')
+    assert replace_text(day, '### Day 7: Renamed\nVisit the museum.').startswith(heading + '\nVisit the museum.')
+    assert replace_text(day, '### Day 9\nNew day.', keep_heading=False).startswith('### Day 9')
+
+
+@pytest.fixture
+def saved_itinerary(isolated_app, monkeypatch):
+    """Save a 2-day itinerary whose content ends without a newline; OpenRouter returns canned replies"""
+    isolated_app.save_users_db({'a@example.com': {'itineraries': [{
+        'id': 'trip-1', 'destination': 'Lagos', 'days': 2, 'budget': 'moderate', 'interests': ['Culture'],
+        'content': '## Day 1\nA\n\n## Day 2\nB'
+    }]}})
+    monkeypatch.setattr(isolated_app, 'call_openrouter', lambda prompt, max_tokens: '## Day 3\nC')
+    return isolated_app
+
+
+def edit(app_module, change):
+    with app_module.app.test_client() as client:
+        return client.post('/api/user/edit-itinerary', json={
+            'email': 'a@example.com', 'itineraryId': 'trip-1', 'change': change
+        })
+
+
+def test_adding_days_starts_new_day_on_its_own_line(saved_itinerary):
+    response = edit(saved_itinerary, {'type': 'days', 'days': 3})
+    assert response.status_code == 200
+    content = response.get_json()['itinerary']['content']
+    assert content.rstrip() == '## Day 1\nA\n\n## Day 2\nB\n\n## Day 3\nC'
+    assert [s['key'] for s in split_sections(content)] == ['day-1', 'day-2', 'day-3']
+    # The saved copy can be edited again by day
+    assert edit(saved_itinerary, {'type': 'day', 'day': 3, 'instructions': 'More food'}).status_code == 200
+
+
+@pytest.mark.parametrize('interests', ['Food', [1, 2], ['Food', None]])
+def test_interests_must_be_list_of_strings(saved_itinerary, interests):
+    response = edit(saved_itinerary, {'type': 'interests', 'interests': interests})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Interests must be a list of strings'
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import pytest
+
+import app as app_module
+import profiler
+from app import app
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    monkeypatch.setitem(profiler.settings, 'enabled', False)
+    monkeypatch.setitem(profiler.settings, 'sample_rate', 0.0)
+    profiler.slow_requests.clear()
+    yield
+    profiler.slow_requests.clear()
+
+
+def test_admin_header_profiles_request_while_disabled(admin):
+    with app.test_client() as client:
+        response = client.get('/health', headers={'X-Profile': '1', 'X-Admin-Token': 'secret'})
+    assert 'total;dur=' in response.headers['Server-Timing']
+    assert [record['path'] for record in profiler.slow_requests.records()] == ['/health']
+    assert not profiler.sampler.active
+
+
+def test_disabled_profiler_ignores_other_requests(admin):
+    with app.test_client() as client:
+        plain = client.get('/health')
+        forged = client.get('/health', headers={'X-Profile': '1', 'X-Admin-Token': 'wrong'})
+    assert 'Server-Timing' not in plain.headers
+    assert 'Server-Timing' not in forged.headers
+    assert profiler.slow_requests.records() == []
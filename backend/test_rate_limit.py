@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+import rate_limit
+from rate_limit import FairShareQueue, SlidingWindowLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=600.0)
+    monkeypatch.setattr(rate_limit.time, 'time', lambda: now.value)
+    return now
+
+
+def test_limiter_retry_after_within_and_across_windows(tmp_path, clock):
+    limiter = SlidingWindowLimiter(str(tmp_path / 'limits.db'), 60)
+    assert [limiter.hit('client', 3) for _ in range(3)] == [0, 0, 0]
+    # Current window is full: wait for it to end
+    assert limiter.hit('client', 3) == 60
+    clock.value = 630
+    assert limiter.hit('client', 3) == 30
+    # New window, but all of the previous one still overlaps: wait until a third has slid out
+    clock.value = 660
+    assert limiter.hit('client', 3) == 20
+    clock.value = 680
+    assert limiter.hit('client', 3) == 0
+    # Other clients have their own budget
+    assert limiter.hit('other', 3) == 0
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_queue_hands_slots_to_clients_round_robin():
+    queue = FairShareQueue(1, 2, timeout=5)
+    assert queue.acquire('holder')
+    order = []
+
+    def worker(client):
+        assert queue.acquire(client)
+        order.append(client)
+        queue.release()
+
+    threads = []
+    for client, queued in (('a', 1), ('a', 2), ('b', 1)):
+        thread = threading.Thread(target=worker, args=(client,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: len(queue._waiting.get(client, ())) == queued)
+    queue.release()
+    for thread in threads:
+        thread.join()
+    assert order == ['a', 'b', 'a']
+
+
+def test_queue_rejects_client_over_waiting_cap_and_times_out():
+    queue = FairShareQueue(0, 1, timeout=0.5)
+    waiter = threading.Thread(target=queue.acquire, args=('a',))
+    waiter.start()
+    wait_until(lambda: 'a' in queue._waiting)
+    start = time.monotonic()
+    assert not queue.acquire('a')
+    assert time.monotonic() - start < 0.1
+    waiter.join()
+    assert not queue._waiting
+
+    queue = FairShareQueue(0, 1, timeout=0.05)
+    assert not queue.acquire('b')
+    assert not queue._waiting
+
+
+@pytest.fixture
+def limited_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(rate_limit, 'limiter', SlidingWindowLimiter(str(tmp_path / 'limits.db'), 60))
+    monkeypatch.setattr(rate_limit, 'generation_queue', FairShareQueue(1, 2, timeout=1))
+    app = Flask(__name__)
+
+    @app.route('/generate', methods=['POST'])
+    @rate_limit.rate_limited('generate', 2)
+    def generate():
+        return 'ok'
+
+    return app
+
+
+def test_made_up_emails_share_the_ip_budget(limited_app):
+    with limited_app.test_client() as client:
+        statuses = [
+            client.post('/generate', json={'email': f'user{i}@example.com'}).status_code for i in range(3)
+        ]
+        assert statuses == [200, 200, 429]
+        assert client.post('/generate', json={'email': 'user0@example.com'},
+                           environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+        # Nor does a new IP reset the budget of an email that is used up
+        assert client.post('/generate', json={'email': 'user0@example.com'},
+                           environ_base={'REMOTE_ADDR': '10.0.0.3'}).status_code == 429
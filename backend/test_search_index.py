@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import threading
+
+import pytest
+
+import search_index
+
+USERS_DB = {
+    'a@example.com': {'itineraries': [
+        {'id': 'a1', 'destination': 'Lagos', 'content': 'Day 1\nBeach day at Tarkwa Bay.\n\nDay 2\nHiking in Lekki.'},
+    ]},
+    'b@example.com': {'itineraries': [
+        {'id': 'b1', 'destination': 'Bali', 'content': 'Surf lessons and a beach sunset.'},
+    ]},
+}
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, 'SEARCH_INDEX_FILE', str(tmp_path / 'search_index.db'))
+    monkeypatch.setattr(search_index, '_local', threading.local())
+    monkeypatch.setattr(search_index, '_load_users_db', lambda: USERS_DB)
+    return search_index
+
+
+def hits(index, text, email=None):
+    return [(r['email'], r['itineraryId']) for r in index.search(text, email=email)]
+
+
+def test_builds_from_users_db_and_scopes_by_owner(index):
+    assert sorted(hits(index, 'beach')) == [('a@example.com', 'a1'), ('b@example.com', 'b1')]
+    assert hits(index, 'beach', email='a@example.com') == [('a@example.com', 'a1')]
+    assert hits(index, 'surf', email='a@example.com') == []
+    assert hits(index, 'hike') == [('a@example.com', 'a1')]
+    result = index.search('tarkwa', email='a@example.com')[0]
+    assert result['destination'] == 'Lagos'
+    assert '**Tarkwa**' in result['snippet']
+
+
+def test_index_replace_and_remove(index):
+    index.index_itinerary('a@example.com', {'id': 'a2', 'destination': 'Accra', 'content': 'Jollof tasting.'})
+    assert hits(index, 'jollof', email='a@example.com') == [('a@example.com', 'a2')]
+    # Re-indexing replaces the old paragraphs instead of adding to them
+    index.index_itinerary('a@example.com', {'id': 'a2', 'destination': 'Accra', 'content': 'Kelewele tasting.'})
+    assert hits(index, 'jollof') == []
+    assert hits(index, 'kelewele') == [('a@example.com', 'a2')]
+
+    index.remove_itineraries('a@example.com', ['a1', 'a2'])
+    assert hits(index, 'beach kelewele') == [('b@example.com', 'b1')]
+    # Removing is scoped to the owner
+    index.remove_itineraries('a@example.com', ['b1'])
+    assert hits(index, 'surf') == [('b@example.com', 'b1')]
+
+
+def test_rebuilds_when_tokenizer_changes(index, monkeypatch):
+    index.remove_itineraries('b@example.com', ['b1'])
+    assert hits(index, 'surf') == []
+    # A new process with stemming turned off finds the index was built differently
+    monkeypatch.setattr(search_index, 'TOKENIZER', 'unicode61 remove_diacritics 2')
+    monkeypatch.setattr(search_index, '_local', threading.local())
+    assert hits(index, 'surf') == [('b@example.com', 'b1')]
+    assert hits(index, 'hike') == []
+
+
+def test_query_syntax_is_not_injected(index):
+    assert index.build_query('Beach "NEAR(x OR beach') == '"beach" OR "near" OR "x" OR "or"'
+    assert index.search('owner : *') == []
+    assert index.search('   ') == []
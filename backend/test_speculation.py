@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+import pytest
+
+from speculation import SpeculativeCache
+
+
+@pytest.fixture
+def cache():
+    cache = SpeculativeCache(ttl=60, max_entries=4, workers=1)
+    yield cache
+    cache._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_take_returns_finished_result_once(cache):
+    assert cache.start('lagos', lambda: 'plan')
+    assert cache.start('lagos', lambda: 'other')
+    assert cache.take('lagos', timeout=1) == 'plan'
+    assert cache.take('lagos', timeout=1) is None
+    assert (cache.stats['hits'], cache.stats['misses'], cache.stats['deduplicated']) == (1, 1, 1)
+
+
+def test_queued_speculation_is_cancelled_not_waited_for(cache):
+    release = threading.Event()
+    cache.start('busy', release.wait)
+    ran = []
+    cache.start('queued', lambda: ran.append(True))
+    start = time.monotonic()
+    assert cache.take('queued', timeout=5) is None
+    assert time.monotonic() - start < 0.5
+    assert cache.stats['queued'] == 1
+    release.set()
+    assert cache.take('busy', timeout=1) is True
+    assert ran == []
+
+
+def test_running_speculation_is_waited_for_up_to_timeout(cache):
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+        return 'late'
+
+    cache.start('slow', slow)
+    started.wait(1)
+    assert cache.take('slow', timeout=0.05) is None
+    assert cache.stats['timeouts'] == 1
+    release.set()
+
+
+def test_failed_speculation_counts_as_failed(cache):
+    cache.start('broken', lambda: 1 / 0)
+    assert cache.take('broken', timeout=1) is None
+    assert cache.stats['failed'] == 1
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'days': -3}, 'Days must be a whole number of at least 1'),
+    ({'days': 0}, 'Days must be a whole number of at least 1'),
+    ({'days': 'three'}, 'Days must be a whole number of at least 1'),
+    ({'interests': 'Food'}, 'Interests must be a list of strings'),
+    ({'interests': [{'name': 'Food'}]}, 'Interests must be a list of strings'),
+])
+def test_prefetch_rejects_bad_trip_shapes(isolated_app, body, error):
+    with isolated_app.app.test_client() as client:
+        response = client.post('/api/prefetch', json=dict({'destination': 'Lagos', 'budget': 'moderate'}, **body))
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+    assert isolated_app.speculative_cache.stats['started'] == 0
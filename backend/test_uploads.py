@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import socket
+import time
+
+import pytest
+
+from uploads import MAX_FIELD_BYTES, UploadError, receive_image
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 200
+
+
+def multipart(*parts, boundary='B'):
+    """Encode (name, filename or None, bytes) parts as a multipart/form-data body"""
+    body = b''
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += f'--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n'.encode() + data + b'\r\n'
+    return body + f'--{boundary}--\r\n'.encode()
+
+
+def receive(tmp_path, body, max_bytes=1024, chunk_size=64):
+    return receive_image(io.BytesIO(body), 'B', 'avatar', str(tmp_path), max_bytes, timeout=5,
+                         chunk_size=chunk_size)
+
+
+def test_saves_image_streamed_in_small_chunks(tmp_path):
+    body = multipart(('email', None, b'a@example.com'), ('avatar', 'me.png', PNG))
+    temp_path, filename, image_type, fields = receive(tmp_path, body)
+    assert (filename, image_type, fields) == ('me.png', 'png', {'email': 'a@example.com'})
+    assert os.path.dirname(temp_path) == str(tmp_path)
+    with open(temp_path, 'rb') as f:
+        assert f.read() == PNG
+
+
+def test_rejects_oversize_file_and_removes_temp_file(tmp_path):
+    body = multipart(('avatar', 'big.png', PNG * 10))
+    with pytest.raises(UploadError) as error:
+        receive(tmp_path, body)
+    assert error.value.status == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_rejects_oversize_field(tmp_path):
+    body = multipart(('email', None, b'x' * (MAX_FIELD_BYTES + 1)), ('avatar', 'me.png', PNG))
+    with pytest.raises(UploadError) as error:
+        receive(tmp_path, body, max_bytes=10 * MAX_FIELD_BYTES)
+    assert error.value.status == 413
+
+
+@pytest.mark.parametrize('data', [b'<svg xmlns="http://www.w3.org/2000/svg"/>', b'GIF', b''])
+def test_rejects_non_image_whatever_the_filename(tmp_path, data):
+    with pytest.raises(UploadError) as error:
+        receive(tmp_path, multipart(('avatar', 'cat.png', data)))
+    assert (error.value.status, error.value.message) == (400, 'File is not a PNG, JPEG or GIF image')
+    assert os.listdir(tmp_path) == []
+
+
+def test_rejects_missing_file_and_truncated_body(tmp_path):
+    with pytest.raises(UploadError) as error:
+        receive(tmp_path, multipart(('other', 'me.png', PNG)))
+    assert (error.value.status, error.value.message) == (400, 'No file provided')
+
+    with pytest.raises(UploadError) as error:
+        receive(tmp_path, multipart(('avatar', 'me.png', PNG))[:-20])
+    assert error.value.status == 400
+    assert os.listdir(tmp_path) == []
+
+
+def test_deadline_stops_a_client_that_never_finishes(tmp_path):
+    server, client = socket.socketpair()
+    try:
+        client.sendall(multipart(('avatar', 'me.png', PNG))[:40])
+        start = time.monotonic()
+        with pytest.raises(UploadError) as error:
+            receive_image(server.makefile('rb'), 'B', 'avatar', str(tmp_path), 1024,
+                          timeout=0.3, sock=server)
+        assert error.value.status == 408
+        assert time.monotonic() - start < 2
+        assert os.listdir(tmp_path) == []
+    finally:
+        server.close()
+        client.close()
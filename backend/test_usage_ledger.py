@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import sqlite3
+
+import pytest
+
+import usage_ledger
+from usage_ledger import UsageLedger
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'usage.db')
+
+
+def ledger_for(db_path):
+    # Long interval so only the test flushes
+    return UsageLedger(db_path, flush_interval=3600)
+
+
+def stored_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT user, endpoint, requests, prompt_tokens, completion_tokens FROM usage").fetchall()
+    finally:
+        conn.close()
+
+
+def test_records_are_aggregated_until_flush(db_path):
+    ledger = ledger_for(db_path)
+    ledger.record('email:a@x.com', 'generate', 'm', 100, 50, 200.0)
+    ledger.record('email:a@x.com', 'generate', 'm', 10, 5, 400.0)
+    ledger.record('email:a@x.com', 'ask', 'm', 1, 1, 10.0)
+    assert len(ledger._pending) == 2
+    assert ledger.flush() == 2
+    assert sorted(stored_rows(db_path)) == [
+        ('email:a@x.com', 'ask', 1, 1, 1), ('email:a@x.com', 'generate', 2, 110, 55)
+    ]
+    [row] = ledger.rollup(group_by=('endpoint',), user='email:a@x.com', limit=1)
+    assert row == dict(endpoint='generate', requests=2, promptTokens=110, completionTokens=55,
+                       totalTokens=165, avgLatencyMs=300.0, maxLatencyMs=400.0)
+    assert ledger.flush() == 0
+
+
+def test_failed_flush_keeps_counters(db_path, monkeypatch):
+    ledger = ledger_for(db_path)
+    ledger.record('email:a@x.com', 'generate', 'm', 100, 50, 200.0)
+
+    def broken_connect():
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(ledger, '_connect', broken_connect)
+    with pytest.raises(sqlite3.OperationalError):
+        ledger.flush()
+    # Recorded while the failed batch was out; both must be merged back
+    ledger.record('email:a@x.com', 'generate', 'm', 10, 5, 900.0)
+    monkeypatch.undo()
+    ledger.flush()
+    assert stored_rows(db_path) == [('email:a@x.com', 'generate', 2, 110, 55)]
+    assert ledger.rollup(user='email:a@x.com')[0]['maxLatencyMs'] == 900.0
+
+
+def test_daily_totals_fold_in_other_workers(db_path):
+    worker_a, worker_b = ledger_for(db_path), ledger_for(db_path)
+    assert worker_a.tokens_today('email:a@x.com') == 0
+    worker_a.record('email:a@x.com', 'generate', 'm', 10, 5, 1.0)
+    # In-memory total moves with each record, before any flush
+    assert worker_a.tokens_today('email:a@x.com') == 15
+    worker_b.record('email:a@x.com', 'generate', 'm', 100, 0, 1.0)
+    worker_b.flush()
+    assert worker_a.tokens_today('email:a@x.com') == 15
+    # Worker A's next flush refreshes its total from the database
+    worker_a.record('email:a@x.com', 'ask', 'm', 1, 0, 1.0)
+    worker_a.flush()
+    assert worker_a.tokens_today('email:a@x.com') == 116
+    assert ledger_for(db_path).tokens_today('email:a@x.com') == 116
+
+
+def test_daily_totals_reset_on_a_new_day(db_path, monkeypatch):
+    ledger = ledger_for(db_path)
+    monkeypatch.setattr(usage_ledger, 'today', lambda: '2026-01-01')
+    ledger.record('email:a@x.com', 'generate', 'm', 10, 0, 1.0)
+    assert ledger.tokens_today('email:a@x.com') == 10
+    ledger.flush()
+    monkeypatch.setattr(usage_ledger, 'today', lambda: '2026-01-02')
+    assert ledger.tokens_today('email:a@x.com') == 0
+    ledger.record('email:a@x.com', 'generate', 'm', 3, 0, 1.0)
+    ledger.flush()
+    assert set(ledger._daily) == {('2026-01-02', 'email:a@x.com')}
+
+
+def test_ip_totals_span_every_email_from_that_ip(db_path):
+    ledger = ledger_for(db_path)
+    assert ledger.tokens_today('ip:10.0.0.1') == 0
+    ledger.record('email:a@x.com', 'generate', 'm', 10, 0, 1.0, ip='ip:10.0.0.1')
+    ledger.record('email:b@x.com', 'generate', 'm', 20, 0, 1.0, ip='ip:10.0.0.1')
+    # Anonymous calls are recorded under the IP key itself; counted once
+    ledger.record('ip:10.0.0.1', 'generate', 'm', 5, 0, 1.0, ip='ip:10.0.0.1')
+    assert ledger.tokens_today('ip:10.0.0.1') == 35
+    assert ledger.tokens_today('email:b@x.com') == 20
+    ledger.flush()
+    assert ledger.tokens_today('ip:10.0.0.1') == 35
+    assert ledger_for(db_path).tokens_today('ip:10.0.0.1') == 35
+    assert ledger_for(db_path).tokens_today('email:a@x.com') == 10
@@ -0,0 +1,171 @@
+"""
+Streaming multipart ingestion for image uploads.
+
+The request body is read in fixed-size chunks and fed to Werkzeug's
+incremental multipart decoder instead of letting Flask buffer the whole
+form. The file part is checked against image magic bytes as soon as its
+first bytes arrive, counted against the size limit as it streams, and
+written to a hidden temp file in the destination folder that is renamed
+into place only once it is complete. Memory per upload stays around one
+chunk regardless of file size.
+
+The upload deadline is enforced on the socket: a timer shuts down its read
+side when time runs out, so a client trickling a few bytes at a time cannot
+keep a worker thread blocked inside read().
+"""
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NEED_DATA
+
+CHUNK_SIZE = 64 * 1024
+MAX_FIELD_BYTES = 4 * 1024
+
+# Leading bytes of each accepted image type -> extension
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+SNIFF_BYTES = max(len(signature) for signature, _ in IMAGE_SIGNATURES)
+
+
+class UploadError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def sniff_image_type(head: bytes):
+    """Image extension for the file's first bytes, or None if it is not an accepted image"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def receive_image(stream, boundary, file_field, dest_dir, max_bytes, timeout, sock=None, chunk_size=CHUNK_SIZE):
+    """
+    Stream a multipart body, saving the part named file_field into dest_dir.
+
+    Returns (temp_path, filename, image_type, form_fields). The caller
+    renames temp_path into place with os.replace (see commit_upload) or
+    removes it. Raises UploadError on a bad, oversized or too-slow upload.
+    sock is the client connection; without it the deadline is only checked
+    between chunks.
+    """
+    # Events are drained after every chunk, so the decoder never holds much more than one
+    decoder = MultipartDecoder(boundary.encode('latin-1'), max_form_memory_size=2 * chunk_size)
+    deadline = time.monotonic() + timeout
+    fields = {}
+    field_name = field_value = None
+    current = None  # 'field', 'file' or 'skip'
+    out = temp_path = filename = image_type = None
+    head = b''
+    size = 0
+    complete = False
+    watchdog = None
+    if sock is not None:
+        watchdog = threading.Timer(timeout, _stop_reading, (sock,))
+        watchdog.daemon = True
+        watchdog.start()
+
+    try:
+        while True:
+            try:
+                chunk = stream.read(chunk_size)
+            except Exception:
+                # The watchdog cut the connection off mid-read
+                if time.monotonic() > deadline:
+                    raise UploadError(408, 'Upload took too long')
+                raise
+            if time.monotonic() > deadline:
+                raise UploadError(408, 'Upload took too long')
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+            while event is not NEED_DATA:
+                if isinstance(event, Field):
+                    current, field_name, field_value = 'field', event.name, bytearray()
+                elif isinstance(event, File):
+                    if event.name != file_field or out is not None:
+                        current = 'skip'
+                    else:
+                        current, filename = 'file', event.filename
+                        fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=dest_dir)
+                        out = os.fdopen(fd, 'wb')
+                elif isinstance(event, Data):
+                    if current == 'field':
+                        field_value += event.data
+                        if len(field_value) > MAX_FIELD_BYTES:
+                            raise UploadError(413, 'Form field too large')
+                        if not event.more_data:
+                            fields[field_name] = field_value.decode('utf-8', 'replace')
+                    elif current == 'file':
+                        size += len(event.data)
+                        if size > max_bytes:
+                            raise UploadError(413, f'File too large. Maximum size is {max_bytes // (1024 * 1024)}MB')
+                        if image_type is None:
+                            head += event.data[:SNIFF_BYTES - len(head)]
+                            if len(head) >= SNIFF_BYTES or not event.more_data:
+                                image_type = sniff_image_type(head)
+                                if image_type is None:
+                                    raise UploadError(400, 'File is not a PNG, JPEG or GIF image')
+                        out.write(event.data)
+                elif isinstance(event, Epilogue):
+                    complete = True
+                    break
+                event = decoder.next_event()
+            if complete or not chunk:
+                break
+
+        if not complete:
+            raise UploadError(400, 'Upload was incomplete')
+        if out is None:
+            raise UploadError(400, 'No file provided')
+        if image_type is None:
+            raise UploadError(400, 'File is not a PNG, JPEG or GIF image')
+        out.close()
+        return temp_path, filename, image_type, fields
+    except UploadError:
+        _discard(out, temp_path)
+        raise
+    except RequestEntityTooLarge:
+        _discard(out, temp_path)
+        raise UploadError(413, f'Upload too large. Maximum size is {max_bytes // (1024 * 1024)}MB')
+    except ValueError as e:
+        # Malformed multipart data or decoder limits
+        _discard(out, temp_path)
+        raise UploadError(400, f'Malformed upload: {e}')
+    except Exception:
+        _discard(out, temp_path)
+        raise
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+
+
+def _stop_reading(sock):
+    """Make any blocked or later read on sock return end-of-stream"""
+    try:
+        sock.shutdown(socket.SHUT_RD)
+    except OSError:
+        pass
+
+
+def commit_upload(temp_path, final_path):
+    """Atomically move a completed upload into place"""
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, final_path)
+
+
+def _discard(out, temp_path):
+    if out is not None and not out.closed:
+        out.close()
+    if temp_path and os.path.exists(temp_path):
+        os.remove(temp_path)
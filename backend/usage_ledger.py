@@ -0,0 +1,240 @@
+"""
+Token usage ledger for OpenRouter calls.
+
+Every completion's usage block is added to in-memory counters keyed by
+(day, user, endpoint, model); a background thread flushes them in one
+batched upsert every few seconds, so request threads never write to disk.
+Per-user daily totals are also kept in memory so quota checks are a dict
+lookup. Totals are seeded from the database the first time a user is seen
+each day and refreshed after every flush, which folds in usage recorded by
+other workers.
+
+Usage is also totalled per client IP in ip_usage, whatever email the call
+claimed, so an IP can be held to the quota too. Daily totals for "ip:"
+keys come from that table.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    day TEXT NOT NULL,
+    user TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    model TEXT NOT NULL,
+    requests INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    latency_ms_total REAL NOT NULL,
+    latency_ms_max REAL NOT NULL,
+    PRIMARY KEY (day, user, endpoint, model)
+) WITHOUT ROWID
+"""
+IP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ip_usage (
+    day TEXT NOT NULL,
+    ip TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    PRIMARY KEY (day, ip)
+) WITHOUT ROWID
+"""
+
+GROUP_COLUMNS = {'day': 'day', 'user': 'user', 'endpoint': 'endpoint', 'model': 'model'}
+
+
+def today():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+def is_ip_key(key):
+    return key.startswith('ip:')
+
+
+class UsageLedger:
+    def __init__(self, path, flush_interval=5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending = {}  # (day, user, endpoint, model) -> [requests, prompt, completion, latency total, latency max]
+        self._pending_ip = {}  # (day, ip) -> tokens
+        self._daily = {}  # (day, user) -> total tokens
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(SCHEMA)
+        conn.execute(IP_SCHEMA)
+        return conn
+
+    def _ensure_flusher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='usage-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing usage ledger: {e}")
+
+    def record(self, user, endpoint, model, prompt_tokens, completion_tokens, latency_ms, ip=None):
+        day = today()
+        tokens = prompt_tokens + completion_tokens
+        with self._lock:
+            counters = self._pending.get((day, user, endpoint, model))
+            if counters is None:
+                counters = self._pending[(day, user, endpoint, model)] = [0, 0, 0, 0.0, 0.0]
+            counters[0] += 1
+            counters[1] += prompt_tokens
+            counters[2] += completion_tokens
+            counters[3] += latency_ms
+            counters[4] = max(counters[4], latency_ms)
+            if ip:
+                self._pending_ip[(day, ip)] = self._pending_ip.get((day, ip), 0) + tokens
+            # Totals for IP keys only count what was recorded against the IP
+            for key in (None if is_ip_key(user) else user, ip):
+                if key and (day, key) in self._daily:
+                    self._daily[(day, key)] += tokens
+        self._ensure_flusher()
+
+    def flush(self):
+        """Write pending counters in one transaction and refresh daily totals"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                ip_batch, self._pending_ip = self._pending_ip, {}
+            if not batch and not ip_batch:
+                return 0
+            try:
+                conn = self._connect()
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                            "ON CONFLICT (day, user, endpoint, model) DO UPDATE SET "
+                            "requests = requests + excluded.requests, "
+                            "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                            "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                            "latency_ms_total = latency_ms_total + excluded.latency_ms_total, "
+                            "latency_ms_max = MAX(latency_ms_max, excluded.latency_ms_max)",
+                            [key + tuple(counters) for key, counters in batch.items()]
+                        )
+                        conn.executemany(
+                            "INSERT INTO ip_usage VALUES (?, ?, ?) "
+                            "ON CONFLICT (day, ip) DO UPDATE SET tokens = tokens + excluded.tokens",
+                            [key + (tokens,) for key, tokens in ip_batch.items()]
+                        )
+                    day = today()
+                    users = {user for (batch_day, user, _, _) in batch if batch_day == day and not is_ip_key(user)}
+                    users.update(ip for (batch_day, ip) in ip_batch if batch_day == day)
+                    totals = {user: self._stored_total(conn, day, user) for user in users}
+                finally:
+                    conn.close()
+            except Exception:
+                # Keep the counters for the next attempt rather than dropping usage
+                with self._lock:
+                    for key, counters in batch.items():
+                        merged = self._pending.setdefault(key, [0, 0, 0, 0.0, 0.0])
+                        for i in range(4):
+                            merged[i] += counters[i]
+                        merged[4] = max(merged[4], counters[4])
+                    for key, tokens in ip_batch.items():
+                        self._pending_ip[key] = self._pending_ip.get(key, 0) + tokens
+                raise
+            with self._lock:
+                for user, total in totals.items():
+                    self._daily[(day, user)] = total + self._pending_tokens(day, user)
+                # Forget earlier days
+                for key in [k for k in self._daily if k[0] != day]:
+                    del self._daily[key]
+            return len(batch) + len(ip_batch)
+
+    @staticmethod
+    def _stored_total(conn, day, user):
+        if is_ip_key(user):
+            row = conn.execute(
+                "SELECT COALESCE(SUM(tokens), 0) FROM ip_usage WHERE day = ? AND ip = ?", (day, user)
+            ).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM usage WHERE day = ? AND user = ?",
+                (day, user)
+            ).fetchone()
+        return row[0]
+
+    def _pending_tokens(self, day, user):
+        if is_ip_key(user):
+            return self._pending_ip.get((day, user), 0)
+        return sum(c[1] + c[2] for (d, u, _, _), c in self._pending.items() if d == day and u == user)
+
+    def tokens_today(self, user):
+        """Tokens used by user today; O(1) after the first call of the day"""
+        day = today()
+        with self._lock:
+            total = self._daily.get((day, user))
+        if total is not None:
+            return total
+        conn = self._connect()
+        try:
+            stored = self._stored_total(conn, day, user)
+        finally:
+            conn.close()
+        with self._lock:
+            return self._daily.setdefault((day, user), stored + self._pending_tokens(day, user))
+
+    def rollup(self, group_by=('user',), since=None, until=None, user=None, limit=100):
+        """Aggregated usage grouped by any of day/user/endpoint/model"""
+        self.flush()
+        columns = [GROUP_COLUMNS[g] for g in group_by]
+        where, params = [], []
+        if since:
+            where.append("day >= ?")
+            params.append(since)
+        if until:
+            where.append("day < ?")
+            params.append(until)
+        if user:
+            where.append("user = ?")
+            params.append(user)
+        select = ', '.join(columns)
+        sql = (
+            f"SELECT {select + ', ' if select else ''}SUM(requests), SUM(prompt_tokens), "
+            "SUM(completion_tokens), SUM(latency_ms_total), MAX(latency_ms_max) FROM usage"
+            f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+            f"{' GROUP BY ' + select if select else ''} "
+            "ORDER BY SUM(prompt_tokens + completion_tokens) DESC LIMIT ?"
+        )
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params + [limit]).fetchall()
+        finally:
+            conn.close()
+        results = []
+        for row in rows:
+            keys, (requests, prompt, completion, latency_total, latency_max) = row[:len(columns)], row[len(columns):]
+            if not requests:
+                continue
+            results.append(dict(
+                zip(group_by, keys),
+                requests=requests,
+                promptTokens=prompt,
+                completionTokens=completion,
+                totalTokens=prompt + completion,
+                avgLatencyMs=round(latency_total / requests, 1),
+                maxLatencyMs=round(latency_max, 1)
+            ))
+        return results
+
+
+def seconds_until_midnight():
+    now = time.time()
+    return int(86400 - now % 86400) + 1
@@ -1,12 +1,14 @@
-import React, { useEffect } from 'react';
+import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Plus, Calendar, MapPin, Sparkles } from 'lucide-react';
 import { useUser } from '../context/UserContext';
 import './Dashboard.css';
+import API_BASE_URL from '../config';
 
 const Dashboard = () => {
   const navigate = useNavigate();
   const { itineraries, refreshItineraries } = useUser();
+  const [locationImages, setLocationImages] = useState({});
 
   useEffect(() => {
     refreshItineraries();
@@ -18,6 +20,27 @@ const Dashboard = () => {
   // Get up to 3 recent itineraries (excluding the first one if it exists)
   const recentItineraries = itineraries.length > 1 ? itineraries.slice(1, 4) : [];
 
+  // Look up images for cards saved without one in a single cacheable request
+  const missingImages = [...new Set(
+    [upcomingTrip, ...recentItineraries]
+      .filter(trip => trip && !trip.imageUrl && trip.destination)
+      .map(trip => trip.destination.trim().toLowerCase().replace(/\s+/g, ' '))
+  )].sort();
+
+  useEffect(() => {
+    if (missingImages.length === 0) return;
+    const query = missingImages.map(location => `q=${encodeURIComponent(location)}`).join('&');
+    fetch(`${API_BASE_URL}/api/location-image?${query}`)
+      .then(response => response.json())
+      .then(data => {
+        if (data.success) setLocationImages(prev => ({ ...prev, ...data.images }));
+      })
+      .catch(() => {});
+  }, [missingImages.join('|')]);
+
+  const imageFor = (trip) =>
+    trip.imageUrl || locationImages[(trip.destination || '').trim().toLowerCase().replace(/\s+/g, ' ')] || defaultImage;
+
   // Format date for display
   const formatDate = (dateStr) => {
     if (!dateStr) return '';
@@ -63,7 +86,7 @@ const Dashboard = () => {
           {upcomingTrip ? (
             <div className="trip-card large">
               <img 
-                src={upcomingTrip.imageUrl || defaultImage} 
+                src={imageFor(upcomingTrip)} 
                 alt={upcomingTrip.destination} 
                 className="trip-bg"
                 onError={(e) => { e.target.src = defaultImage; }}
@@ -113,7 +136,7 @@ const Dashboard = () => {
                 <div key={trip.id || index} className="recent-card" onClick={() => navigate(`/itinerary/${trip.id}`)}>
                   <div className="card-image">
                     <img 
-                      src={trip.imageUrl || defaultImage} 
+                      src={imageFor(trip)} 
                       alt={trip.destination}
                       onError={(e) => { e.target.src = defaultImage; }}
                     />
@@ -8,7 +8,7 @@ import API_BASE_URL from '../config';
 const ItineraryDetails = () => {
     const { id } = useParams();
     const navigate = useNavigate();
-    const { saveItinerary, itineraries, refreshItineraries } = useUser();
+    const { user, saveItinerary, itineraries, refreshItineraries } = useUser();
 
     const [showModal, setShowModal] = useState(false);
     const [showItineraryModal, setShowItineraryModal] = useState(false);
@@ -41,6 +41,25 @@ const ItineraryDetails = () => {
         }
     }, [id, itineraries]);
 
+    // Let the backend start generating once the form settles, so submit is faster
+    useEffect(() => {
+        if (!showModal || formData.additionalNotes || formData.destination.trim().length < 3) return;
+        const timer = setTimeout(() => {
+            fetch(`${API_BASE_URL}/api/prefetch`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    destination: formData.destination,
+                    days: formData.days,
+                    budget: formData.budget,
+                    interests: formData.interests,
+                    email: user?.email
+                })
+            }).catch(() => {});
+        }, 1200);
+        return () => clearTimeout(timer);
+    }, [showModal, formData.destination, formData.days, formData.budget, formData.interests, formData.additionalNotes]);
+
     const budgetOptions = [
         { value: 'budget', label: 'Budget ($)' },
         { value: 'moderate', label: 'Moderate ($$)' },
@@ -76,7 +95,8 @@ const ItineraryDetails = () => {
             const response = await fetch(`${API_BASE_URL}/api/generate-itinerary`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(formData)
+                // email keys rate limits and token usage to the same identity as prefetch
+                body: JSON.stringify({ ...formData, email: user?.email })
             });
 
             const data = await response.json();